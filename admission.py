@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import subprocess
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: dev mode runs every job in one process, the thread lock is enough
+    fcntl = None
+
+from scripts.preview import ffmpeg_exe
+
+# Admission control in front of transcription: estimate how long a job will
+# take and, if the user's model choice would blow the turnaround SLO, pick a
+# smaller Whisper model (or accept that the job has to wait in the queue).
+
+TURNAROUND_SLO_SECONDS = float(os.getenv('TURNAROUND_SLO_SECONDS', '600'))
+REALTIME_FACTORS_FILE = os.getenv('REALTIME_FACTORS_FILE', 'realtime_factors.json')
+INFERENCE_WORKERS = max(1, int(os.getenv('INFERENCE_WORKERS', '2')))
+EWMA_ALPHA = 0.3              # Weight of the newest run when updating a learned factor
+DEFAULT_JOB_SECONDS = 120.0   # Queue-wait estimate for jobs enqueued without an estimate
+
+# Smallest to largest; a job is only ever moved down this list
+MODEL_LADDER = ["tiny", "base", "small", "medium", "large-v2", "large-v3"]
+
+# Seconds of processing per second of video until real runs have been measured
+# (CPU int8 ballpark). "post" covers rewriting, layout and rendering.
+DEFAULT_FACTORS = {
+    "tiny": 0.05,
+    "base": 0.1,
+    "small": 0.3,
+    "medium": 0.8,
+    "large-v2": 1.6,
+    "large-v3": 1.6,
+    "post": 0.6,
+}
+
+_factors_lock = threading.Lock()
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def probe_duration(video_path):
+    """Container duration in seconds, read from the header (no frames are decoded)"""
+    # ffmpeg with no output prints the input's header info and exits
+    try:
+        proc = subprocess.run([ffmpeg_exe(), "-hide_banner", "-i", video_path],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except OSError:
+        return None
+    match = _DURATION_RE.search(proc.stderr.decode(errors="replace"))
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def load_factors():
+    """Learned realtime factors merged over the defaults"""
+    factors = dict(DEFAULT_FACTORS)
+    with _factors_lock:
+        if os.path.exists(REALTIME_FACTORS_FILE):
+            try:
+                with open(REALTIME_FACTORS_FILE, 'r') as f:
+                    factors.update({k: v['factor'] for k, v in json.load(f).items()})
+            except (ValueError, KeyError, TypeError):
+                print(f"⚠️ Ignoring unreadable {REALTIME_FACTORS_FILE}")
+    return factors
+
+
+@contextmanager
+def _factors_update_lock():
+    """Serialize read-update-replace of the factors file across threads and worker processes"""
+    with _factors_lock:
+        if fcntl is None:
+            yield
+            return
+        # A sidecar file: the factors file itself is replaced on every update
+        with open(f"{REALTIME_FACTORS_FILE}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _update_factor(data, key, factor):
+    entry = data.get(key)
+    if entry is None:
+        data[key] = {'factor': factor, 'runs': 1}
+    else:
+        entry['factor'] = (1 - EWMA_ALPHA) * entry['factor'] + EWMA_ALPHA * factor
+        entry['runs'] += 1
+
+
+def record_run(model_size, duration, transcribe_seconds, post_seconds=None):
+    """Fold one finished job's stage timings into the learned factors (post_seconds=None: no render)"""
+    if not duration or duration <= 0:
+        return
+    with _factors_update_lock():
+        data = {}
+        if os.path.exists(REALTIME_FACTORS_FILE):
+            try:
+                with open(REALTIME_FACTORS_FILE, 'r') as f:
+                    data = json.load(f)
+            except ValueError:
+                data = {}
+        _update_factor(data, model_size, transcribe_seconds / duration)
+        if post_seconds is not None:
+            _update_factor(data, "post", post_seconds / duration)
+        # Workers are separate processes: replace the file atomically so readers never see half of it
+        tmp_path = f"{REALTIME_FACTORS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, REALTIME_FACTORS_FILE)
+
+
+def estimate_job_seconds(duration, model_size, factors=None, languages=1):
+    """Expected processing time of one job on one worker"""
+    factors = factors or load_factors()
+    transcribe = duration * factors.get(model_size, DEFAULT_FACTORS["medium"])
+    # Every burned-in language is another render; captions-only jobs have none
+    return transcribe + duration * factors["post"] * languages
+
+
+def admit(video_path, model_size, queued_seconds=0.0, workers=INFERENCE_WORKERS,
+          slo_seconds=TURNAROUND_SLO_SECONDS, languages=1):
+    """
+    Choose the Whisper model a job runs with.
+
+    Estimated turnaround = time until a worker frees up (queued work spread
+    over the workers) + this job's own processing time. The largest model no
+    bigger than the requested one that keeps turnaround within the SLO wins.
+    If the backlog alone already breaks the SLO, the job is queued with the
+    largest model whose own processing time fits: downgrading further
+    wouldn't bring the SLO back.
+
+    Args:
+        video_path (str): Uploaded video.
+        model_size (str): Model the user asked for.
+        queued_seconds (float): Estimated work already queued or running.
+        workers (int): Inference workers sharing that backlog.
+        slo_seconds (float): Turnaround target.
+        languages (int): Rendered videos the job produces (0 for captions-only).
+
+    Returns:
+        dict: 'model', 'requested_model', 'decision' ('run' | 'downgrade' |
+            'queue'), 'duration', 'estimated_seconds', 'wait_seconds'.
+    """
+    duration = probe_duration(video_path)
+    wait_seconds = queued_seconds / max(1, workers)
+    admission = {
+        'model': model_size,
+        'requested_model': model_size,
+        'decision': 'run',
+        'duration': duration,
+        'estimated_seconds': None,
+        'wait_seconds': wait_seconds,
+    }
+    if duration is None or model_size not in MODEL_LADDER:
+        # Can't estimate; run what was asked for
+        return admission
+
+    factors = load_factors()
+    candidates = MODEL_LADDER[:MODEL_LADDER.index(model_size) + 1][::-1]
+    estimates = {m: estimate_job_seconds(duration, m, factors, languages) for m in candidates}
+
+    chosen = next((m for m in candidates if wait_seconds + estimates[m] <= slo_seconds), None)
+    if chosen is None:
+        chosen = next((m for m in candidates if estimates[m] <= slo_seconds), candidates[-1])
+        admission['decision'] = 'queue'
+    elif chosen != model_size:
+        admission['decision'] = 'downgrade'
+
+    admission['model'] = chosen
+    admission['estimated_seconds'] = estimates[chosen]
+    if chosen != model_size:
+        print(f"🚦 Admission: {model_size} → {chosen} for a {duration:.0f}s video "
+              f"(~{wait_seconds:.0f}s wait + ~{estimates[chosen]:.0f}s run, SLO {slo_seconds:.0f}s)")
+    return admission
@@ -3,11 +3,14 @@ import os
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'  # Fix OpenMP conflict
 
 from flask import Flask, render_template, request, send_file, flash, redirect, jsonify, url_for, session
-from scripts.transcribe import transcribe_video
-from scripts.generate_srt import segments_to_srt
-from scripts.rewrite_captions_gemini import rewrite_captions
-from scripts.overlay import overlay_captions
-from database import init_db, create_user, verify_user, get_user_by_id, save_video_record, get_all_user_videos
+from database import init_db, create_user, verify_user, get_user_by_id, get_all_user_videos, get_video_by_id, get_caption_artifacts
+from storage import StorageManager
+from jobqueue import init_queue, enqueue_job, get_job, queue_depth, pending_work_seconds
+from admission import admit, MODEL_LADDER, INFERENCE_WORKERS, DEFAULT_JOB_SECONDS
+from pipeline import process_video, rerender_video, resume_job, make_unique_id, PipelineError
+from checkpoints import open_checkpoint
+from scripts.rewrite_backends import OFFLINE_STYLES
+from scripts.subtitle_mux import ISO639_2
 import threading
 import webbrowser
 import secrets
@@ -30,6 +33,11 @@ else:
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max file size
 app.config['UPLOAD_EXTENSIONS'] = ['.mp4', '.mov', '.avi', '.mkv']
 app.config['OUTPUT_FOLDER'] = 'outputs'
+app.config['PREVIEW_RENDITIONS'] = os.getenv('PREVIEW_RENDITIONS', '1') == '1'  # Poster, sprites + low-bitrate preview
+# Production mode (serve.py): hand jobs to the worker.py pool instead of processing in the request
+app.config['USE_JOB_QUEUE'] = os.getenv('CAPTION_JOB_QUEUE') == '1'
+app.config['UPLOAD_FOLDER'] = 'uploads'
+app.config['MAX_EXTRA_LANGS'] = int(os.getenv('MAX_EXTRA_LANGS', '4'))  # Each one is a rewrite (and a render when burning)
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'  # Better session security
 app.config['SESSION_COOKIE_HTTPONLY'] = True    # Prevent XSS attacks
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=2)  # Session lasts 2 hours
@@ -40,6 +48,15 @@ os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
 # Initialize database
 init_db()
 
+# Keep outputs/ within its disk quotas (evicts least-recently-downloaded videos).
+# In production mode serve.py runs the sweeper, once for all web and worker processes.
+storage = StorageManager(app.config['OUTPUT_FOLDER'])
+if app.config['USE_JOB_QUEUE']:
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    init_queue()
+else:
+    storage.start_sweeper()
+
 # Login decorator (optional - user can use without login)
 def login_optional(f):
     """Decorator that doesn't require login but passes user info if logged in"""
@@ -118,6 +135,60 @@ def history():
     videos = get_all_user_videos(user_id)
     return render_template("history.html", videos=videos, username=username)
 
+@app.route("/rerender/<int:video_id>", methods=["POST"])
+@login_required
+def rerender(video_id):
+    """Re-burn (or re-mux, for soft subtitles) the saved captions of an evicted video onto a re-uploaded original"""
+    record = get_video_by_id(video_id, session['user_id'])
+    if not record:
+        flash("❌ Video not found!", "error")
+        return redirect(url_for('history'))
+
+    soft_tracks = None
+    if record['subtitle_mode'] == 'soft':
+        # Every language was a track of the one MP4: mux them all back in
+        soft_tracks = {a['language']: a['srt_file'] for a in get_caption_artifacts(video_id)} \
+            or {record['language']: record['srt_file']}
+    srt_files = soft_tracks.values() if soft_tracks else [record['srt_file']]
+    if not all(os.path.exists(os.path.join(app.config['OUTPUT_FOLDER'], f)) for f in srt_files):
+        flash("❌ Saved captions for this video are missing, please process it again.", "error")
+        return redirect(url_for('history'))
+
+    video = request.files.get("video")
+    if not video or not any(video.filename.lower().endswith(ext) for ext in app.config['UPLOAD_EXTENSIONS']):
+        flash("❌ Please upload the original MP4, MOV, AVI, or MKV file!", "error")
+        return redirect(url_for('history'))
+
+    if app.config['USE_JOB_QUEUE']:
+        upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f"rerender_{video_id}_{make_unique_id(video.filename)}.mp4")
+        video.save(upload_path)
+        job_id = enqueue_job({
+            'kind': 'rerender',
+            'video_path': upload_path,
+            'original_name': record['original_filename'],
+            'video_file': record['video_file'],
+            'srt_file': record['srt_file'],
+            'soft_tracks': soft_tracks,
+            'output_folder': app.config['OUTPUT_FOLDER'],
+        }, user_id=session['user_id'])
+        return redirect(url_for('job_status', job_id=job_id))
+
+    temp_path = f"temp_rerender_{video_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+    video.save(temp_path)
+
+    try:
+        # Transcription and rewriting are skipped: the kept SRTs are used as-is
+        rerender_video(temp_path, record['video_file'], record['srt_file'], app.config['OUTPUT_FOLDER'],
+                       soft_tracks=soft_tracks)
+        flash(f"✅ {record['original_filename']} re-rendered!", "success")
+    except Exception as e:
+        flash(f"⚠️ An error occurred: {str(e)}", "error")
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return redirect(url_for('history'))
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
@@ -125,6 +196,12 @@ def index():
         style = request.form.get("style")
         lang = request.form.get("lang")
         speed = request.form.get("speed", "base")  # Default to "base" if not provided
+        requested_langs = request.form.getlist("extra_langs")
+        extra_langs = list(dict.fromkeys(l for l in requested_langs if l in ISO639_2 and l != lang))
+        subtitle_mode = request.form.get("subtitle_mode", "burn")
+        if request.form.get("output") == "captions":
+            subtitle_mode = "captions"  # Captions-only: no video is rendered
+        caption_formats = [f for f in request.form.getlist("formats") if f in ("vtt", "ass")]
 
         # Validate inputs
         if not video:
@@ -141,147 +218,153 @@ def index():
             flash("❌ Please fill in all fields!", "error")
             return redirect("/")
 
+        if lang not in ISO639_2 or any(l and l not in ISO639_2 for l in requested_langs):
+            flash("❌ Unsupported language selected!", "error")
+            return redirect("/")
+
+        if len(extra_langs) > app.config['MAX_EXTRA_LANGS']:
+            flash(f"❌ Pick at most {app.config['MAX_EXTRA_LANGS']} extra languages per video.", "error")
+            return redirect("/")
+
+        if style in OFFLINE_STYLES and any(l != "en" for l in [lang, *extra_langs]):
+            # "None" is offline cleanup only; it can never translate, so don't transcribe for nothing
+            flash("❌ The None style only cleans up English captions. Pick a caption style to translate.", "error")
+            return redirect("/")
+
+        if subtitle_mode not in ("burn", "soft", "captions"):
+            flash("❌ Invalid subtitle mode!", "error")
+            return redirect("/")
+
+        if speed not in MODEL_LADDER:
+            flash("❌ Invalid processing speed!", "error")
+            return redirect("/")
+
+        renders = {"burn": 1 + len(extra_langs), "soft": 1, "captions": 0}[subtitle_mode]
+
         # Generate unique filename with timestamp
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        base_name = os.path.splitext(video.filename)[0]
-        safe_base = "".join(c for c in base_name if c.isalnum() or c in ('_', '-'))[:50]
-        
-        # Create unique filenames
-        unique_id = f"{safe_base}_{timestamp}"
+        unique_id = make_unique_id(video.filename)
+
+        if app.config['USE_JOB_QUEUE']:
+            upload_path = os.path.join(app.config['UPLOAD_FOLDER'], f"upload_{unique_id}{os.path.splitext(filename)[1]}")
+            video.save(upload_path)
+            # Model choice accounts for everything already waiting for a worker
+            admission = admit(upload_path, speed,
+                              queued_seconds=pending_work_seconds(DEFAULT_JOB_SECONDS),
+                              workers=INFERENCE_WORKERS, languages=renders)
+            job_id = enqueue_job({
+                'video_path': upload_path,
+                'unique_id': unique_id,
+                'original_name': video.filename,
+                'style': style,
+                'lang': lang,
+                'speed': admission['model'],
+                'requested_speed': speed,
+                'estimated_seconds': admission['estimated_seconds'],
+                'admission': admission['decision'],
+                'username': session.get('username', 'Guest'),
+                'output_folder': app.config['OUTPUT_FOLDER'],
+                'previews': app.config['PREVIEW_RENDITIONS'],
+                'extra_langs': extra_langs,
+                'subtitle_mode': subtitle_mode,
+                'caption_formats': caption_formats,
+            }, user_id=session.get('user_id'))
+            return redirect(url_for('job_status', job_id=job_id))
+
         temp_path = f"temp_{unique_id}.mp4"
-        output_video = os.path.join(app.config['OUTPUT_FOLDER'], f"captioned_{unique_id}.mp4")
-        srt_path = os.path.join(app.config['OUTPUT_FOLDER'], f"captions_{unique_id}.srt")
-        
         video.save(temp_path)
 
         try:
-            import time
-            total_start = time.time()
-            
-            print("\n" + "="*80)
-            print("🎬 VIDEO PROCESSING PIPELINE STARTED")
-            print("="*80)
-            print(f"📹 Input file: {video.filename}")
-            print(f"📊 File size: {os.path.getsize(temp_path) / 1024 / 1024:.2f} MB")
-            print(f"🎨 Style: {style}")
-            print(f"🌍 Language: {lang}")
-            print(f"⚡ Speed: {speed}")
-            print(f"� User: {session.get('username', 'Guest')}")
-            print("="*80)
-            
-            # STEP 1: Whisper Transcription
-            step1_start = time.time()
-            segments = transcribe_video(temp_path, model_size=speed)
-            step1_time = time.time() - step1_start
-            
-            if not segments:
-                flash("❌ No transcription segments found!", "error")
-                return redirect("/")
-
-            # STEP 2: Gemini Caption Rewriting
-            step2_start = time.time()
-            print("\n" + "="*60)
-            print("📝 GEMINI CAPTION REWRITING STARTED")
-            print("="*60)
-            print(f"📊 Total segments: {len(segments)}")
-            print(f"🎨 Style: {style}")
-            print(f"🌍 Language: {lang}")
-            print("="*60)
-            
-            for i, seg in enumerate(segments, 1):
-                seg_start = time.time()
-                original_text = seg["text"]
-                seg["text"] = rewrite_captions(seg["text"], style=style, lang=lang).text
-                seg_time = time.time() - seg_start
-                
-                if i % 5 == 0 or i == len(segments):
-                    avg_time = (time.time() - step2_start) / i
-                    remaining = (len(segments) - i) * avg_time
-                    print(f"\n📊 Progress: {i}/{len(segments)} ({i/len(segments)*100:.1f}%)")
-                    print(f"   ⏱️  Avg time per segment: {avg_time:.2f}s")
-                    print(f"   ⏳ Est. remaining: {remaining:.1f}s")
-            
-            step2_time = time.time() - step2_start
-            print(f"\n✅ Caption rewriting complete in {step2_time:.1f}s")
-            print(f"   Average: {step2_time/len(segments):.2f}s per segment")
-            print("="*60 + "\n")
-
-            # STEP 3: Generate SRT
-            step3_start = time.time()
-            print("="*60)
-            print("📄 GENERATING SRT FILE")
-            print("="*60)
-            segments_to_srt(segments, srt_path)
-            step3_time = time.time() - step3_start
-            print(f"✅ SRT file created: {os.path.basename(srt_path)}")
-            print(f"⏱️  Time: {step3_time:.2f}s")
-            print("="*60 + "\n")
-
-            # STEP 4: Overlay Captions
-            step4_start = time.time()
-            print("="*60)
-            print("🎥 OVERLAYING CAPTIONS ON VIDEO")
-            print("="*60)
-            print(f"📹 Input: {os.path.basename(temp_path)}")
-            print(f"📄 Captions: {os.path.basename(srt_path)}")
-            print(f"📹 Output: {os.path.basename(output_video)}")
-            print("🔄 Processing (this may take a while)...")
-            overlay_captions(temp_path, srt_path, output_video)
-            step4_time = time.time() - step4_start
-            print(f"✅ Video overlay complete in {step4_time:.1f}s")
-            print("="*60 + "\n")
-            
-            # Summary
-            total_time = time.time() - total_start
-            print("\n" + "="*80)
-            print("✅ PROCESSING COMPLETE - SUMMARY")
-            print("="*80)
-            print(f"⏱️  Step 1 - Whisper Transcription: {step1_time:.1f}s ({step1_time/total_time*100:.1f}%)")
-            print(f"⏱️  Step 2 - Gemini Rewriting: {step2_time:.1f}s ({step2_time/total_time*100:.1f}%)")
-            print(f"⏱️  Step 3 - SRT Generation: {step3_time:.2f}s ({step3_time/total_time*100:.1f}%)")
-            print(f"⏱️  Step 4 - Video Overlay: {step4_time:.1f}s ({step4_time/total_time*100:.1f}%)")
-            print(f"{'─'*80}")
-            print(f"⏱️  TOTAL TIME: {total_time:.1f}s ({total_time/60:.2f} minutes)")
-            print(f"📊 Segments processed: {len(segments)}")
-            print(f"📹 Output file: {os.path.basename(output_video)}")
-            print(f"💾 Output size: {os.path.getsize(output_video) / 1024 / 1024:.2f} MB")
-            print("="*80 + "\n")
-
-            # Save to database if user is logged in
-            if 'user_id' in session:
-                save_video_record(
-                    user_id=session['user_id'],
-                    original_filename=video.filename,
-                    video_file=f"captioned_{unique_id}.mp4",
-                    srt_file=f"captions_{unique_id}.srt",
-                    style=style,
-                    language=lang
-                )
+            # Inline mode has no queue: only this job's own runtime counts
+            admission = admit(temp_path, speed, workers=1, languages=renders)
+            result_data = process_video(
+                temp_path,
+                unique_id,
+                video.filename,
+                style,
+                lang,
+                speed=admission['model'],
+                requested_speed=speed,
+                user_id=session.get('user_id'),
+                username=session.get('username', 'Guest'),
+                output_folder=app.config['OUTPUT_FOLDER'],
+                previews=app.config['PREVIEW_RENDITIONS'],
+                extra_langs=extra_langs,
+                subtitle_mode=subtitle_mode,
+                caption_formats=caption_formats,
+            )
 
             # Store result info in session with permanent flag
             session.permanent = True  # Make session persistent
-            session['result'] = {
-                'video_file': f"captioned_{unique_id}.mp4",
-                'srt_file': f"captions_{unique_id}.srt",
-                'original_name': video.filename,
-                'style': style,
-                'lang': lang,
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'saved': 'user_id' in session  # Indicate if saved to history
-            }
+            session['result'] = result_data
 
             return redirect(url_for('result'))
 
+        except PipelineError as e:
+            flash(f"❌ {e}", "error")
+            _remember_resumable(unique_id, video.filename)
+            return redirect("/")
+
         except Exception as e:
             flash(f"⚠️ An error occurred: {str(e)}", "error")
+            _remember_resumable(unique_id, video.filename)
             return redirect("/")
 
         finally:
-            # Cleanup temporary file only
+            # The pipeline moved the upload into its checkpoint; this only catches early failures
             if os.path.exists(temp_path):
                 os.remove(temp_path)
 
-    return render_template("index.html")
+    return render_template("index.html", resumable=_resumable_jobs())
+
+
+def _remember_resumable(unique_id, original_name):
+    """Offer a failed job for resuming if its checkpoint survived"""
+    if open_checkpoint(unique_id) is None:
+        return
+    jobs = [j for j in session.get('resumable_jobs', []) if j['id'] != unique_id]
+    session['resumable_jobs'] = (jobs + [{'id': unique_id, 'name': original_name}])[-5:]
+
+
+def _resumable_jobs():
+    """This session's failed jobs that can still be resumed"""
+    jobs = [j for j in session.get('resumable_jobs', []) if open_checkpoint(j['id']) is not None]
+    if len(jobs) != len(session.get('resumable_jobs', [])):
+        session['resumable_jobs'] = jobs
+    return jobs
+
+
+@app.route("/resume/<unique_id>", methods=["POST"])
+def resume(unique_id):
+    """Retry a failed job from its first unfinished stage"""
+    if not any(j['id'] == unique_id for j in session.get('resumable_jobs', [])):
+        flash("❌ Job not found.", "error")
+        return redirect("/")
+    checkpoint = open_checkpoint(unique_id)
+    if checkpoint is None:
+        flash("❌ This job can no longer be resumed, please upload the video again.", "error")
+        return redirect("/")
+
+    session['resumable_jobs'] = [j for j in session['resumable_jobs'] if j['id'] != unique_id]
+    original_name = checkpoint.params['original_name']
+
+    if app.config['USE_JOB_QUEUE']:
+        job_id = enqueue_job({
+            'kind': 'resume',
+            'unique_id': unique_id,
+            'original_name': original_name,
+        }, user_id=checkpoint.params['user_id'])
+        return redirect(url_for('job_status', job_id=job_id))
+
+    try:
+        session.permanent = True
+        session['result'] = resume_job(unique_id)
+        return redirect(url_for('result'))
+    except PipelineError as e:
+        flash(f"❌ {e}", "error")
+    except Exception as e:
+        flash(f"⚠️ An error occurred: {str(e)}", "error")
+    _remember_resumable(unique_id, original_name)
+    return redirect("/")
 
 
 @app.route("/result")
@@ -293,10 +376,56 @@ def result():
     return render_template("result.html", result=result_data)
 
 
+def _get_visible_job(job_id):
+    """A job, if it exists and belongs to the current user (guest jobs are link-only)"""
+    job = get_job(job_id)
+    if job and job['user_id'] is not None and job['user_id'] != session.get('user_id'):
+        return None
+    return job
+
+
+@app.route("/job/<job_id>")
+def job_status(job_id):
+    """Waiting page for a queued job; shows the result once a worker finishes it"""
+    job = _get_visible_job(job_id)
+    if not job:
+        flash("❌ Job not found.", "error")
+        return redirect("/")
+    if job['status'] == 'done':
+        if job['result'].get('kind') == 'rerender':
+            flash(f"✅ {job['params']['original_name']} re-rendered!", "success")
+            return redirect(url_for('history'))
+        return render_template("result.html", result=job['result'])
+    if job['status'] == 'failed':
+        flash(job['error'], "error")
+        if job['params'].get('unique_id'):
+            _remember_resumable(job['params']['unique_id'], job['params']['original_name'])
+        return redirect("/")
+    return render_template("job.html", job=job, queue_depth=queue_depth())
+
+
+@app.route("/job/<job_id>/status")
+def job_status_json(job_id):
+    job = _get_visible_job(job_id)
+    if not job:
+        return jsonify({'error': 'not found'}), 404
+    return jsonify({'status': job['status'], 'queue_depth': queue_depth()})
+
+
+@app.route("/captions/<filename>")
+def captions(filename):
+    """Serve WebVTT caption tracks for the result page's <video> element"""
+    file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
+    if filename.startswith('captions_') and filename.endswith('.vtt') and os.path.exists(file_path):
+        return send_file(file_path, mimetype='text/vtt')
+    return ("Not found", 404)
+
+
 @app.route("/download/<filename>")
 def download(filename):
     file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
     if os.path.exists(file_path):
+        storage.record_access(filename)
         return send_file(file_path, as_attachment=True)
     else:
         flash("❌ File not found!", "error")
@@ -306,14 +435,28 @@ def download(filename):
 @app.route("/preview/<filename>")
 def preview(filename):
     """Serve video file for preview (not download)"""
+    # Exactly the file asked for: the result page picks the preview rendition's own URL
+    # when it exists, so ranged requests never switch files mid-playback
     file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
     if os.path.exists(file_path):
-        return send_file(file_path, mimetype='video/mp4')
+        # Watching the preview counts as using its full-resolution video
+        storage.record_access('captioned_' + filename[len('preview_'):]
+                              if filename.startswith('preview_') else filename)
+        return send_file(file_path, mimetype='video/mp4', conditional=True)
     else:
         flash("❌ File not found!", "error")
         return redirect("/")
 
 
+@app.route("/thumbnail/<filename>")
+def thumbnail(filename):
+    """Serve poster frames and sprite sheets (+ their WebVTT index)"""
+    file_path = os.path.join(app.config['OUTPUT_FOLDER'], filename)
+    if filename.startswith(('poster_', 'sprite_')) and os.path.exists(file_path):
+        return send_file(file_path, max_age=86400)
+    return ("Not found", 404)
+
+
 def open_browser():
     webbrowser.open("http://127.0.0.1:5000/")
 
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import time
+
+# Every pipeline job gets a directory holding its source video and each
+# finished stage's output, so a failed or interrupted job can be resumed
+# without re-running (and re-paying for) the stages that already finished.
+JOBS_FOLDER = os.getenv('JOBS_FOLDER', 'jobs')
+# Failed jobs nobody resumed are deleted after this long
+CHECKPOINT_RETENTION_HOURS = float(os.getenv('CHECKPOINT_RETENTION_HOURS', '24'))
+
+STAGES = ["transcribe", "rewrite", "srt", "render"]
+RECORD_FILE = "job.json"
+
+
+class JobCheckpoint:
+    """
+    On-disk state of one pipeline job: jobs/<unique_id>/
+
+        job.json         params + stage-completion record
+        source.<ext>     the uploaded video (kept until the job succeeds)
+        segments.json    Whisper output
+        rewritten.json   {lang: [texts]}
+        captions.json    {lang: laid-out cues}; SRT files themselves go to outputs/
+
+    The render stage's videos are written straight to the outputs folder.
+    """
+
+    def __init__(self, unique_id, jobs_folder=JOBS_FOLDER):
+        self.unique_id = unique_id
+        self.path = os.path.join(jobs_folder, unique_id)
+        self.record = None
+
+    @property
+    def exists(self):
+        return os.path.exists(os.path.join(self.path, RECORD_FILE))
+
+    def _write_json(self, name, data):
+        # Write-then-rename so a crash never leaves a half-written checkpoint behind
+        tmp_path = os.path.join(self.path, f".{name}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, os.path.join(self.path, name))
+
+    def _save_record(self):
+        self.record['updated_at'] = time.time()
+        self._write_json(RECORD_FILE, self.record)
+
+    def create(self, video_path, params):
+        """Start a new job: move the upload into the job directory and record params"""
+        os.makedirs(self.path, exist_ok=True)
+        source = os.path.join(self.path, "source" + os.path.splitext(video_path)[1])
+        shutil.move(video_path, source)
+        self.record = {
+            'unique_id': self.unique_id,
+            'params': params,
+            'source': os.path.basename(source),
+            'stages': {},
+            'error': None,
+            'created_at': time.time(),
+        }
+        self._save_record()
+        return self
+
+    def load(self):
+        with open(os.path.join(self.path, RECORD_FILE), 'r') as f:
+            self.record = json.load(f)
+        return self
+
+    @property
+    def source_path(self):
+        return os.path.join(self.path, self.record['source'])
+
+    @property
+    def params(self):
+        return self.record['params']
+
+    def is_done(self, stage):
+        return stage in self.record['stages']
+
+    def next_stage(self):
+        """First stage that hasn't completed (None when the job is finished)"""
+        return next((s for s in STAGES if not self.is_done(s)), None)
+
+    def complete(self, stage, seconds, data_file=None, data=None):
+        """Checkpoint a stage's output (if any), then mark it done"""
+        if data_file is not None:
+            self._write_json(data_file, data)
+        self.record['stages'][stage] = {'seconds': seconds, 'finished_at': time.time()}
+        self.record['error'] = None
+        self._save_record()
+
+    def read(self, data_file):
+        with open(os.path.join(self.path, data_file), 'r') as f:
+            return json.load(f)
+
+    def fail(self, error):
+        self.record['error'] = error
+        self._save_record()
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def open_checkpoint(unique_id, jobs_folder=JOBS_FOLDER):
+    """Existing job checkpoint, or None"""
+    checkpoint = JobCheckpoint(unique_id, jobs_folder)
+    return checkpoint.load() if checkpoint.exists else None
+
+
+def purge_stale_checkpoints(max_age_hours=CHECKPOINT_RETENTION_HOURS, jobs_folder=JOBS_FOLDER):
+    """Delete job directories untouched for longer than max_age_hours"""
+    if not os.path.isdir(jobs_folder):
+        return 0
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    for entry in os.scandir(jobs_folder):
+        record_path = os.path.join(entry.path, RECORD_FILE)
+        if entry.is_dir() and os.path.getmtime(record_path if os.path.exists(record_path) else entry.path) < cutoff:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} abandoned job checkpoint(s)")
+    return removed
@@ -7,7 +7,7 @@ DATABASE = 'video_captions.db'
 
 def get_db_connection():
     """Create a database connection"""
-    conn = sqlite3.connect(DATABASE)
+    conn = sqlite3.connect(DATABASE, timeout=30)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -15,7 +15,10 @@ def init_db():
     """Initialize database with required tables"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    
+    # Every gunicorn worker runs this on import: take the write lock up front so
+    # only one creates/migrates the schema and the rest see the finished result
+    cursor.execute('BEGIN IMMEDIATE')
+
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -38,10 +41,41 @@ def init_db():
             style TEXT NOT NULL,
             language TEXT NOT NULL,
             processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            video_bytes INTEGER DEFAULT 0,
+            srt_bytes INTEGER DEFAULT 0,
+            last_accessed_at TIMESTAMP,
+            evicted_at TIMESTAMP,
+            subtitle_mode TEXT DEFAULT 'burn',
+            caption_formats TEXT DEFAULT '',
             FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
         )
     ''')
     
+    # Caption artifacts (one row per language of a multi-language job)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS caption_artifacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            video_id INTEGER NOT NULL,
+            language TEXT NOT NULL,
+            srt_file TEXT NOT NULL,
+            video_file TEXT,
+            FOREIGN KEY (video_id) REFERENCES videos (id) ON DELETE CASCADE
+        )
+    ''')
+
+    # Storage lifecycle columns: in CREATE TABLE above for new databases, added in place to older ones
+    existing = {row['name'] for row in cursor.execute('PRAGMA table_info(videos)')}
+    for column, definition in (
+        ('video_bytes', 'INTEGER DEFAULT 0'),
+        ('srt_bytes', 'INTEGER DEFAULT 0'),
+        ('last_accessed_at', 'TIMESTAMP'),
+        ('evicted_at', 'TIMESTAMP'),
+        ('subtitle_mode', "TEXT DEFAULT 'burn'"),  # burn | soft | captions (no video)
+        ('caption_formats', "TEXT DEFAULT ''"),    # Extra formats next to each SRT, e.g. "vtt,ass"
+    ):
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE videos ADD COLUMN {column} {definition}')
+
     conn.commit()
     conn.close()
     print("✅ Database initialized successfully!")
@@ -99,18 +133,36 @@ def get_user_by_id(user_id):
     conn.close()
     return dict(user) if user else None
 
-def save_video_record(user_id, original_filename, video_file, srt_file, style, language):
-    """Save processed video record to database"""
+def save_video_record(user_id, original_filename, video_file, srt_file, style, language,
+                      video_bytes=0, srt_bytes=0, subtitle_mode='burn', artifacts=(), caption_formats=()):
+    """
+    Save processed video record to database.
+
+    For multi-language jobs `language` is the primary language and each entry
+    of `artifacts` ({'lang', 'srt_file', 'video_file'}) becomes a
+    caption_artifacts row under the same video.
+
+    Captions-only jobs (subtitle_mode 'captions') have no rendered video:
+    video_file is ''. caption_formats lists the extra files ("vtt", "ass")
+    written next to every SRT under the same name.
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT INTO videos (user_id, original_filename, video_file, srt_file, style, language)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, original_filename, video_file, srt_file, style, language))
+        INSERT INTO videos (user_id, original_filename, video_file, srt_file, style, language,
+                            video_bytes, srt_bytes, subtitle_mode, caption_formats, last_accessed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (user_id, original_filename, video_file, srt_file, style, language,
+          video_bytes, srt_bytes, subtitle_mode, ','.join(caption_formats)))
+    video_id = cursor.lastrowid
+
+    cursor.executemany('''
+        INSERT INTO caption_artifacts (video_id, language, srt_file, video_file)
+        VALUES (?, ?, ?, ?)
+    ''', [(video_id, a['lang'], a['srt_file'], a.get('video_file')) for a in artifacts])
     
     conn.commit()
-    video_id = cursor.lastrowid
     conn.close()
     return video_id
 
@@ -131,7 +183,7 @@ def get_user_videos(user_id, limit=10):
     return [dict(video) for video in videos]
 
 def get_all_user_videos(user_id):
-    """Get all videos for a user"""
+    """Get all videos for a user, each with its list of caption artifacts"""
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -141,9 +193,23 @@ def get_all_user_videos(user_id):
         ORDER BY processed_at DESC
     ''', (user_id,))
     
-    videos = cursor.fetchall()
+    videos = [dict(video) for video in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT caption_artifacts.* FROM caption_artifacts
+        JOIN videos ON videos.id = caption_artifacts.video_id
+        WHERE videos.user_id = ?
+        ORDER BY caption_artifacts.id
+    ''', (user_id,))
+    artifacts = {}
+    for row in cursor.fetchall():
+        artifacts.setdefault(row['video_id'], []).append(dict(row))
     conn.close()
-    return [dict(video) for video in videos]
+
+    for video in videos:
+        video['artifacts'] = artifacts.get(video['id'], [])
+        video['caption_formats'] = [f for f in (video.get('caption_formats') or '').split(',') if f]
+    return videos
 
 def delete_video_record(video_id, user_id):
     """Delete a video record (for cleanup)"""
@@ -157,6 +223,113 @@ def delete_video_record(video_id, user_id):
     conn.close()
     return deleted
 
+def get_video_by_id(video_id, user_id):
+    """Get a single video record owned by the user"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM videos WHERE id = ? AND user_id = ?', (video_id, user_id))
+    video = cursor.fetchone()
+    conn.close()
+    return dict(video) if video else None
+
+def get_caption_artifacts(video_id):
+    """Per-language caption rows of a multi-language job, in track order"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT * FROM caption_artifacts WHERE video_id = ? ORDER BY id', (video_id,))
+    artifacts = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return artifacts
+
+def get_output_file_owners():
+    """Map every recorded output file (video and SRT) to its owner, for storage accounting"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT videos.video_file, videos.srt_file, videos.user_id, videos.caption_formats FROM videos
+        UNION ALL
+        SELECT caption_artifacts.video_file, caption_artifacts.srt_file, videos.user_id, videos.caption_formats
+        FROM caption_artifacts JOIN videos ON videos.id = caption_artifacts.video_id
+    ''')
+    owners = {}
+    for row in cursor.fetchall():
+        if row['video_file']:
+            owners[row['video_file']] = row['user_id']
+        owners[row['srt_file']] = row['user_id']
+        for fmt in (row['caption_formats'] or '').split(','):
+            if fmt:
+                owners[os.path.splitext(row['srt_file'])[0] + '.' + fmt] = row['user_id']
+    conn.close()
+    return owners
+
+def touch_video_file(video_file):
+    """Record a download/preview of a video file (an extra-language render touches its job)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE videos SET last_accessed_at = CURRENT_TIMESTAMP
+        WHERE video_file = ? OR id IN (SELECT video_id FROM caption_artifacts WHERE video_file = ?)
+    ''', (video_file, video_file))
+    conn.commit()
+    conn.close()
+
+def get_video_access_times():
+    """Map every recorded video file to the Unix time it was last downloaded or previewed"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # CURRENT_TIMESTAMP is UTC, which is what strftime('%s') expects
+    cursor.execute('''
+        SELECT video_file, CAST(strftime('%s', last_accessed_at) AS REAL) AS accessed FROM videos
+        WHERE video_file != '' AND last_accessed_at IS NOT NULL
+        UNION ALL
+        SELECT caption_artifacts.video_file, CAST(strftime('%s', videos.last_accessed_at) AS REAL)
+        FROM caption_artifacts JOIN videos ON videos.id = caption_artifacts.video_id
+        WHERE caption_artifacts.video_file IS NOT NULL AND videos.last_accessed_at IS NOT NULL
+    ''')
+    times = {row['video_file']: row['accessed'] for row in cursor.fetchall()}
+    conn.close()
+    return times
+
+def mark_video_evicted(video_file):
+    """Flag a video whose rendered file was deleted (its SRT is kept)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        'UPDATE videos SET evicted_at = CURRENT_TIMESTAMP WHERE video_file = ? AND evicted_at IS NULL',
+        (video_file,)
+    )
+    # Extra-language renders of multi-language jobs are simply dropped
+    cursor.execute(
+        'UPDATE caption_artifacts SET video_file = NULL WHERE video_file = ?',
+        (video_file,)
+    )
+    conn.commit()
+    conn.close()
+
+def mark_video_restored(video_file, video_bytes):
+    """Clear the evicted flag after a video has been re-rendered"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE videos SET evicted_at = NULL, video_bytes = ?, last_accessed_at = CURRENT_TIMESTAMP
+        WHERE video_file = ?
+    ''', (video_bytes, video_file))
+    conn.commit()
+    conn.close()
+
+def get_live_video_files():
+    """Video files the database believes are still on disk"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT video_file FROM videos WHERE evicted_at IS NULL AND video_file != ''
+        UNION
+        SELECT video_file FROM caption_artifacts WHERE video_file IS NOT NULL
+    ''')
+    files = [row['video_file'] for row in cursor.fetchall()]
+    conn.close()
+    return files
+
 # Initialize database on import
 if __name__ == '__main__':
     init_db()
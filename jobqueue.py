@@ -0,0 +1,212 @@
+import json
+import os
+import secrets
+import sqlite3
+import time
+
+# Local job queue shared by the web processes and the inference workers.
+# Kept in its own SQLite file so queue churn never locks the users/videos DB.
+QUEUE_DATABASE = os.getenv('JOB_QUEUE_DB', 'job_queue.db')
+# A running job whose pool hasn't renewed its lease for this long is orphaned
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+# Jobs that keep killing their worker are failed instead of re-queued forever
+MAX_JOB_ATTEMPTS = int(os.getenv('MAX_JOB_ATTEMPTS', '3'))
+
+
+def get_queue_connection():
+    """Create a queue database connection"""
+    conn = sqlite3.connect(QUEUE_DATABASE, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def init_queue():
+    """Initialize the jobs table"""
+    conn = get_queue_connection()
+    cursor = conn.cursor()
+    # WAL lets readers (status polling) run while a worker is writing
+    cursor.execute('PRAGMA journal_mode=WAL')
+    # Every gunicorn worker and the pool run this at once on first start: take the write
+    # lock up front so only one of them creates/migrates and the rest see the result
+    cursor.execute('BEGIN IMMEDIATE')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            user_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'queued',
+            params TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            worker TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP,
+            finished_at TIMESTAMP,
+            heartbeat_at REAL,
+            attempts INTEGER DEFAULT 0
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)')
+
+    # Lease columns: in CREATE TABLE above for new queues, added in place to older ones
+    existing = {row['name'] for row in cursor.execute('PRAGMA table_info(jobs)')}
+    for column, definition in (
+        ('heartbeat_at', 'REAL'),              # Unix time the owning pool last vouched for the job
+        ('attempts', 'INTEGER DEFAULT 0'),     # Times a worker has claimed the job
+    ):
+        if column not in existing:
+            cursor.execute(f'ALTER TABLE jobs ADD COLUMN {column} {definition}')
+    conn.commit()
+    conn.close()
+
+
+def _row_to_job(row):
+    if row is None:
+        return None
+    job = dict(row)
+    job['params'] = json.loads(job['params'])
+    job['result'] = json.loads(job['result']) if job['result'] else None
+    return job
+
+
+def enqueue_job(params, user_id=None):
+    """Add a job; returns its (unguessable) id"""
+    job_id = secrets.token_urlsafe(12)
+    conn = get_queue_connection()
+    conn.execute(
+        'INSERT INTO jobs (id, user_id, params) VALUES (?, ?, ?)',
+        (job_id, user_id, json.dumps(params))
+    )
+    conn.commit()
+    conn.close()
+    return job_id
+
+
+def claim_next_job(worker_name):
+    """Atomically move the oldest queued job to 'running' and return it (or None)"""
+    conn = get_queue_connection()
+    try:
+        # IMMEDIATE takes the write lock up front so two workers can't claim the same row
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at, rowid LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = 'running', worker = ?, started_at = CURRENT_TIMESTAMP, "
+            "heartbeat_at = ?, attempts = attempts + 1 WHERE id = ?",
+            (worker_name, time.time(), row['id'])
+        )
+        conn.commit()
+        job = _row_to_job(row)
+        job['status'] = 'running'
+        return job
+    finally:
+        conn.close()
+
+
+def complete_job(job_id, result):
+    """Store a finished job's result"""
+    conn = get_queue_connection()
+    conn.execute(
+        "UPDATE jobs SET status = 'done', result = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (json.dumps(result), job_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def fail_job(job_id, error):
+    """Mark a job as failed with a user-facing message"""
+    conn = get_queue_connection()
+    conn.execute(
+        "UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+        (error, job_id)
+    )
+    conn.commit()
+    conn.close()
+
+
+def get_job(job_id):
+    """Get a job by id"""
+    conn = get_queue_connection()
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    conn.close()
+    return _row_to_job(row)
+
+
+def queue_depth():
+    """Number of jobs waiting or running"""
+    conn = get_queue_connection()
+    count = conn.execute(
+        "SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')"
+    ).fetchone()[0]
+    conn.close()
+    return count
+
+
+def pending_work_seconds(default_seconds):
+    """Estimated processing time of every queued or running job (for admission control)"""
+    conn = get_queue_connection()
+    rows = conn.execute(
+        "SELECT params FROM jobs WHERE status IN ('queued', 'running')"
+    ).fetchall()
+    conn.close()
+    total = 0.0
+    for row in rows:
+        estimate = json.loads(row['params']).get('estimated_seconds')
+        total += estimate if estimate is not None else default_seconds
+    return total
+
+
+def renew_leases(worker_names):
+    """Heartbeat from a pool: its live workers' running jobs are still owned"""
+    if not worker_names:
+        return
+    conn = get_queue_connection()
+    conn.execute(
+        f"UPDATE jobs SET heartbeat_at = ? WHERE status = 'running' "
+        f"AND worker IN ({', '.join('?' * len(worker_names))})",
+        (time.time(), *worker_names)
+    )
+    conn.commit()
+    conn.close()
+
+
+def _recover_jobs(where, args):
+    """Re-queue matching running jobs (resumed from their checkpoints); fail ones out of attempts"""
+    conn = get_queue_connection()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        failed = conn.execute(
+            f"UPDATE jobs SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP "
+            f"WHERE status = 'running' AND attempts >= ? AND {where}",
+            ("❌ Processing crashed repeatedly on this video", MAX_JOB_ATTEMPTS, *args)
+        ).rowcount
+        requeued = conn.execute(
+            f"UPDATE jobs SET status = 'queued', worker = NULL, started_at = NULL, heartbeat_at = NULL "
+            f"WHERE status = 'running' AND {where}",
+            args
+        ).rowcount
+        conn.commit()
+    finally:
+        conn.close()
+    return requeued, failed
+
+
+def requeue_orphaned_jobs(lease_seconds=JOB_LEASE_SECONDS):
+    """
+    Recover jobs whose pool is gone: running, but the lease hasn't been
+    renewed for lease_seconds. Jobs owned by a live pool (on this box or
+    another) keep being renewed and are left alone.
+
+    Returns:
+        tuple: (re-queued count, failed count)
+    """
+    return _recover_jobs("(heartbeat_at IS NULL OR heartbeat_at < ?)", (time.time() - lease_seconds,))
+
+
+def release_worker_jobs(worker_name):
+    """Recover the job held by a worker process that died; returns (re-queued, failed)"""
+    return _recover_jobs("worker = ?", (worker_name,))
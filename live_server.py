@@ -0,0 +1,94 @@
+"""
+Live captioning server.
+
+Clients stream audio over a WebSocket and get captions back as they are
+decoded. Runs as its own process (Whisper decoding is latency-critical and
+shouldn't share CPU scheduling with the upload web tier):
+
+    python live_server.py --port 5001 --model base
+
+Protocol (ws://host:5001/ws/live?style=none&lang=en):
+  client -> server  binary frames of 16 kHz mono s16le PCM, then the text frame "end"
+  server -> client  JSON text frames:
+    {"type": "provisional", "id", "start", "end", "text", "audio_time", "emitted_at"}
+    {"type": "final", ...same fields}       - stable; never revised
+    {"type": "rewrite", "id", "text", "emitted_at"} - styled version of a final (if ?style= set)
+    {"type": "error", "message", ...}      - decoding failed; later audio is still decoded
+    {"type": "done"}                        - always the last frame, even after an error
+"""
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'  # Fix OpenMP conflict
+
+import argparse
+import json
+import threading
+
+from flask import Flask, request
+from flask_sock import Sock
+from simple_websocket import ConnectionClosed  # flask-sock's transport
+
+from scripts.live_transcribe import LiveCaptionSession
+from scripts.transcribe import load_whisper_model
+
+app = Flask(__name__)
+sock = Sock(app)
+app.config['LIVE_MODEL'] = os.getenv('LIVE_MODEL', 'base')
+
+
+@sock.route('/ws/live')
+def live(ws):
+    style = request.args.get('style') or None
+    lang = request.args.get('lang', 'en')
+    send_lock = threading.Lock()
+    disconnected = threading.Event()
+
+    def emit(event):
+        # Decoder and rewrite threads both send; frames must not interleave
+        with send_lock:
+            if disconnected.is_set():
+                return
+            try:
+                ws.send(json.dumps(event))
+            except ConnectionClosed:
+                # Client went away (often mid-close() flush): drop the rest quietly
+                disconnected.set()
+
+    session = None
+    try:
+        session = LiveCaptionSession(emit, model_size=app.config['LIVE_MODEL'], style=style, lang=lang)
+        while True:
+            try:
+                message = ws.receive()
+            except ConnectionClosed:
+                disconnected.set()
+                break
+            if message is None or message == 'end':
+                break
+            if isinstance(message, (bytes, bytearray)):
+                session.feed(message)
+    except Exception as e:
+        print(f"❌ Live session failed: {e}")
+        emit({'type': 'error', 'message': "Live captioning failed on the server"})
+    finally:
+        try:
+            if session is not None:
+                session.close()
+        finally:
+            # Clients wait for this frame to know the stream is over
+            emit({'type': 'done'})
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live captioning WebSocket server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--model", default=app.config['LIVE_MODEL'], help="Whisper model size for live decoding")
+    args = parser.parse_args()
+
+    app.config['LIVE_MODEL'] = args.model
+    load_whisper_model(args.model)  # Load before the first client connects
+    app.run(host=args.host, port=args.port, threaded=True, use_reloader=False)
+
+
+if __name__ == "__main__":
+    main()
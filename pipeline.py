@@ -0,0 +1,351 @@
+import os
+import secrets
+import time
+from datetime import datetime
+
+from scripts.preview import preview_names
+from database import save_video_record, mark_video_restored
+from admission import probe_duration, record_run
+from checkpoints import JobCheckpoint, open_checkpoint
+
+
+class PipelineError(Exception):
+    """A job failed for a reason worth showing to the user as-is"""
+
+
+def make_unique_id(original_filename):
+    """Filesystem-safe job id from the upload name, a timestamp and a short random suffix"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_name = os.path.splitext(original_filename)[0]
+    safe_base = "".join(c for c in base_name if c.isalnum() or c in ('_', '-'))[:50]
+    # Suffix keeps concurrent uploads of the same file in the same second apart
+    return f"{safe_base}_{timestamp}_{secrets.token_hex(3)}"
+
+
+def process_video(video_path, unique_id, original_name, style, lang, speed="base",
+                  user_id=None, username="Guest", output_folder="outputs", previews=True,
+                  extra_langs=(), subtitle_mode="burn", requested_speed=None, caption_formats=()):
+    """
+    Run the full captioning pipeline on an uploaded video.
+
+    Used inline by the development server and by the inference workers in
+    production mode. video_path is moved into the job's checkpoint directory
+    (see checkpoints.py) and every stage's output is saved there as it
+    finishes. If a job with this unique_id already has a checkpoint, the
+    finished stages are loaded instead of re-run, so a retry after a failed
+    render costs neither Whisper time nor rewrite quota. The checkpoint is
+    deleted once the job succeeds; on failure it is kept for resume_job().
+
+    Multi-language jobs pass extra_langs: the video is transcribed once, the
+    rewrites for every language run in parallel and one SRT is written per
+    language. subtitle_mode "burn" renders one captioned video per language;
+    "soft" writes a single MP4 carrying every language as a subtitle track.
+    "captions" is the captions-only fast path: only the audio track is
+    extracted and transcribed, no video is rendered and moviepy is never
+    loaded. caption_formats ("vtt", "ass") are written next to every SRT.
+
+    speed is the model admission control settled on; requested_speed (if it
+    differs) is what the user picked. Stage timings feed the learned
+    realtime factors admission control uses for later jobs.
+
+    Returns:
+        dict: Result info for the result page (files, style, language, ...).
+    """
+    langs = [lang] + [l for l in dict.fromkeys(extra_langs) if l != lang]
+    if subtitle_mode == "soft" and "vtt" not in caption_formats:
+        # Browsers can't show the MP4's mov_text tracks; the result page plays WebVTT instead
+        caption_formats = [*caption_formats, "vtt"]
+    # Primary language keeps the original file names; extra languages get a suffix
+    artifacts = [{
+        'lang': l,
+        'srt_file': f"captions_{unique_id}.srt" if i == 0 else f"captions_{unique_id}_{l}.srt",
+        'video_file': None if subtitle_mode == "captions" else (
+            f"captioned_{unique_id}.mp4" if i == 0 else (
+                f"captioned_{unique_id}_{l}.mp4" if subtitle_mode == "burn" else None)),
+    } for i, l in enumerate(langs)]
+
+    output_video = os.path.join(output_folder, f"captioned_{unique_id}.mp4")
+    srt_path = os.path.join(output_folder, f"captions_{unique_id}.srt")
+
+    checkpoint = open_checkpoint(unique_id)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(unique_id).create(video_path, {
+            'unique_id': unique_id, 'original_name': original_name, 'style': style, 'lang': lang,
+            'speed': speed, 'user_id': user_id, 'username': username, 'output_folder': output_folder,
+            'previews': previews, 'extra_langs': list(extra_langs), 'subtitle_mode': subtitle_mode,
+            'requested_speed': requested_speed, 'caption_formats': list(caption_formats),
+        })
+    video_path = checkpoint.source_path
+    resumed = checkpoint.next_stage() != "transcribe"
+
+    try:
+        return _run_stages(checkpoint, video_path, unique_id, original_name, style, lang, speed,
+                           user_id, username, output_folder, previews, langs, artifacts,
+                           subtitle_mode, requested_speed, output_video, srt_path, resumed,
+                           caption_formats)
+    except Exception as e:
+        checkpoint.fail(str(e))
+        print(f"💾 Progress saved; resume from the '{checkpoint.next_stage()}' stage with job id {unique_id}")
+        raise
+
+
+def resume_job(unique_id):
+    """Re-run a failed or interrupted job from its first incomplete stage"""
+    checkpoint = open_checkpoint(unique_id)
+    if checkpoint is None:
+        raise PipelineError("This job can no longer be resumed, please upload the video again.")
+    params = checkpoint.params
+    print(f"♻️  Resuming {unique_id} at the '{checkpoint.next_stage()}' stage")
+    return process_video(checkpoint.source_path, **params)
+
+
+def _run_stages(checkpoint, video_path, unique_id, original_name, style, lang, speed,
+                user_id, username, output_folder, previews, langs, artifacts,
+                subtitle_mode, requested_speed, output_video, srt_path, resumed, caption_formats):
+    # Stage modules pull in torch/faster-whisper/moviepy; importing them here keeps
+    # the web processes light in production mode, where only workers run jobs
+    from scripts.transcribe import transcribe_video, extract_audio, AudioExtractionError
+    from scripts.generate_srt import write_srt, CAPTION_WRITERS
+    from scripts.caption_layout import layout_captions, probe_frame_size, TEXT_ONLY_MAX_CHARS
+    from scripts.rewrite_backends import rewrite_captions_multi, get_backend
+    from scripts.preview import start_thumbnails, build_preview_rendition
+    from scripts.subtitle_mux import mux_soft_subtitles, SubtitleMuxError
+    captions_only = subtitle_mode == "captions"
+
+    total_start = time.time()
+
+    print("\n" + "="*80)
+    print("🎬 VIDEO PROCESSING PIPELINE STARTED")
+    print("="*80)
+    print(f"📹 Input file: {original_name}")
+    print(f"📊 File size: {os.path.getsize(video_path) / 1024 / 1024:.2f} MB")
+    print(f"🎨 Style: {style}")
+    print(f"🌍 Language(s): {', '.join(langs)}")
+    if len(langs) > 1 or captions_only:
+        print(f"🎞️  Subtitle mode: {subtitle_mode}")
+    print(f"⚡ Speed: {speed}" + (f" (requested {requested_speed})" if requested_speed not in (None, speed) else ""))
+    print(f"👤 User: {username}")
+    print("="*80)
+
+    if resumed:
+        print(f"♻️  Resuming from checkpoint at the '{checkpoint.next_stage()}' stage")
+
+    # STEP 1: Whisper Transcription (once, whatever the number of languages)
+    step1_start = time.time()
+    if checkpoint.is_done("transcribe"):
+        segments = checkpoint.read("segments.json")
+    else:
+        if captions_only:
+            # Whisper only needs the audio: hand it a small WAV instead of the whole container
+            try:
+                audio_path = extract_audio(video_path, os.path.join(checkpoint.path, "audio.wav"))
+            except AudioExtractionError as e:
+                raise PipelineError(str(e))
+            segments = transcribe_video(audio_path, model_size=speed)
+        else:
+            segments = transcribe_video(video_path, model_size=speed)
+        if not segments:
+            raise PipelineError("No transcription segments found!")
+        checkpoint.complete("transcribe", time.time() - step1_start, "segments.json", segments)
+    step1_time = time.time() - step1_start
+
+    # STEP 2: Caption Rewriting (Gemini, or offline when style is "none"/quota is out)
+    step2_start = time.time()
+    print("\n" + "="*60)
+    print("📝 CAPTION REWRITING STARTED")
+    print("="*60)
+    print(f"🧩 Backend: {get_backend(style).name}")
+    print(f"📊 Total segments: {len(segments)} x {len(langs)} language(s)")
+    print(f"🎨 Style: {style}")
+    print(f"🌍 Language(s): {', '.join(langs)}")
+    print("="*60)
+
+    if checkpoint.is_done("rewrite"):
+        print("♻️  Using checkpointed rewrites (no API calls)")
+        rewritten = checkpoint.read("rewritten.json")
+    else:
+        texts = [seg["text"] for seg in segments]
+        rewritten = rewrite_captions_multi(texts, style=style, langs=langs)
+        if lang not in rewritten:
+            if get_backend(style).name == "offline":
+                raise PipelineError(f"Captions can't be translated to '{lang}': offline cleanup is English-only.")
+            # Not checkpointed, so resuming later retries the translation
+            raise PipelineError(f"Captions couldn't be translated to '{lang}': Gemini is unavailable and "
+                                f"offline cleanup is English-only. Try again later.")
+        checkpoint.complete("rewrite", time.time() - step2_start, "rewritten.json", rewritten)
+    # Extra languages that couldn't be translated are dropped rather than shipped as English
+    untranslated_langs = [l for l in langs if l not in rewritten]
+    artifacts[:] = [a for a in artifacts if a['lang'] in rewritten]
+
+    step2_time = time.time() - step2_start
+    print(f"\n✅ Caption rewriting complete in {step2_time:.1f}s")
+    print(f"   Average: {step2_time/(len(segments)*len(langs)):.2f}s per caption")
+    print("="*60 + "\n")
+
+    # STEP 3: Lay out captions once per language (shared by SRT export and overlay)
+    step3_start = time.time()
+    print("="*60)
+    print("📄 LAYING OUT CAPTIONS + EXPORTING SRT")
+    print("="*60)
+    if checkpoint.is_done("srt"):
+        captions_by_lang = checkpoint.read("captions.json")
+    else:
+        # No picture to fit captions-only cues to: break lines at the usual subtitle line length
+        frame_width = None if captions_only else probe_frame_size(video_path)[0]
+        captions_by_lang = {}
+        for artifact in artifacts:
+            lang_segments = [dict(seg, text=text) for seg, text in zip(segments, rewritten[artifact['lang']])]
+            captions_by_lang[artifact['lang']] = layout_captions(lang_segments, frame_width=frame_width,
+                                                                 max_chars=TEXT_ONLY_MAX_CHARS)
+    for artifact in artifacts:
+        # Rewritten even on resume: cheap, and the SRT in outputs/ may have been swept
+        write_srt(captions_by_lang[artifact['lang']], os.path.join(output_folder, artifact['srt_file']))
+        for fmt in caption_formats:
+            CAPTION_WRITERS[fmt](captions_by_lang[artifact['lang']],
+                                 os.path.join(output_folder, os.path.splitext(artifact['srt_file'])[0] + '.' + fmt))
+    if not checkpoint.is_done("srt"):
+        checkpoint.complete("srt", time.time() - step3_start, "captions.json", captions_by_lang)
+    captions = captions_by_lang[lang]
+    step3_time = time.time() - step3_start
+    print(f"✅ SRT file(s) created: {', '.join(a['srt_file'] for a in artifacts)}")
+    print(f"⏱️  Time: {step3_time:.2f}s")
+    print("="*60 + "\n")
+
+    # STEP 4: Overlay Captions (or mux soft subtitle tracks; nothing for captions-only jobs)
+    step4_start = time.time()
+    if captions_only:
+        print("⏭️  Captions only: skipping video output\n")
+    else:
+        print("="*60)
+        print("🎥 OVERLAYING CAPTIONS ON VIDEO" if subtitle_mode == "burn" else "🎞️  MUXING SOFT SUBTITLE TRACKS")
+        print("="*60)
+        print(f"📹 Input: {os.path.basename(video_path)}")
+        print(f"📄 Captions: {len(captions)} cues (in memory)")
+        print(f"📹 Output: {os.path.basename(output_video)}")
+        print("🔄 Processing (this may take a while)...")
+        thumbs_thread = None
+        if previews:
+            # Poster + sprite sheet come from the source, so build them alongside the render
+            thumbs_thread = start_thumbnails(video_path, output_folder, unique_id)
+        if subtitle_mode == "soft":
+            try:
+                mux_soft_subtitles(
+                    video_path,
+                    {a['lang']: os.path.join(output_folder, a['srt_file']) for a in artifacts},
+                    output_video,
+                )
+            except SubtitleMuxError as e:
+                raise PipelineError(str(e))
+        else:
+            from scripts.overlay import overlay_captions  # moviepy: only jobs that render need it
+            for artifact in artifacts:
+                overlay_captions(video_path, captions_by_lang[artifact['lang']],
+                                 os.path.join(output_folder, artifact['video_file']))
+        if thumbs_thread is not None:
+            thumbs_thread.join()
+            # Low-bitrate fragmented MP4, built before the result page is shown so its
+            # first view starts playing after one fragment instead of the full-bitrate file
+            build_preview_rendition(output_video, output_folder, unique_id)
+    step4_time = time.time() - step4_start
+    checkpoint.complete("render", step4_time)
+    if not captions_only:
+        print(f"✅ Video output complete in {step4_time:.1f}s")
+        print("="*60 + "\n")
+
+    # Summary
+    total_time = time.time() - total_start
+    print("\n" + "="*80)
+    print("✅ PROCESSING COMPLETE - SUMMARY")
+    print("="*80)
+    print(f"⏱️  Step 1 - Whisper Transcription: {step1_time:.1f}s ({step1_time/total_time*100:.1f}%)")
+    print(f"⏱️  Step 2 - Caption Rewriting: {step2_time:.1f}s ({step2_time/total_time*100:.1f}%)")
+    print(f"⏱️  Step 3 - Caption Layout + SRT: {step3_time:.2f}s ({step3_time/total_time*100:.1f}%)")
+    print(f"⏱️  Step 4 - Video Output: {step4_time:.1f}s ({step4_time/total_time*100:.1f}%)")
+    print(f"{'─'*80}")
+    print(f"⏱️  TOTAL TIME: {total_time:.1f}s ({total_time/60:.2f} minutes)")
+    print(f"📊 Segments processed: {len(segments)}")
+    if not captions_only:
+        print(f"📹 Output file: {os.path.basename(output_video)}")
+        print(f"💾 Output size: {os.path.getsize(output_video) / 1024 / 1024:.2f} MB")
+    print("="*80 + "\n")
+
+    if not resumed:
+        # Resumed runs skip stages, so their timings would skew the learned factors
+        if captions_only:
+            record_run(speed, probe_duration(video_path), step1_time)
+        else:
+            renders = len(artifacts) if subtitle_mode == "burn" else 1
+            record_run(speed, probe_duration(video_path), step1_time,
+                       (step2_time + step3_time + step4_time) / renders)
+
+    # Save to database if user is logged in
+    if user_id is not None:
+        save_video_record(
+            user_id=user_id,
+            original_filename=original_name,
+            video_file='' if captions_only else f"captioned_{unique_id}.mp4",
+            srt_file=f"captions_{unique_id}.srt",
+            style=style,
+            language=lang,
+            video_bytes=0 if captions_only else os.path.getsize(output_video),
+            srt_bytes=os.path.getsize(srt_path),
+            subtitle_mode=subtitle_mode,
+            artifacts=artifacts if len(artifacts) > 1 else (),
+            caption_formats=caption_formats,
+        )
+
+    # Everything is in outputs/ and the database now; the upload and checkpoints can go
+    checkpoint.remove()
+
+    assets = preview_names(unique_id)
+    return {
+        'video_file': None if captions_only else f"captioned_{unique_id}.mp4",
+        'srt_file': f"captions_{unique_id}.srt",
+        'caption_formats': list(caption_formats),
+        'preview_file': assets['preview'] if os.path.exists(os.path.join(output_folder, assets['preview'])) else None,
+        'poster_file': assets['poster'] if os.path.exists(os.path.join(output_folder, assets['poster'])) else None,
+        'sprite_vtt': assets['sprite_vtt'] if os.path.exists(os.path.join(output_folder, assets['sprite_vtt'])) else None,
+        'original_name': original_name,
+        'style': style,
+        'lang': lang,
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'saved': user_id is not None,  # Indicate if saved to history
+        'subtitle_mode': subtitle_mode,
+        'artifacts': artifacts if len(artifacts) > 1 else [],
+        'untranslated_langs': untranslated_langs,
+        'speed': speed,
+        'requested_speed': requested_speed or speed,
+        'timings': {
+            'transcribe': round(step1_time, 2),
+            'rewrite': round(step2_time, 2),
+            'srt': round(step3_time, 2),
+            'render': round(step4_time, 2),
+            'total': round(total_time, 2),
+        },
+    }
+
+
+def rerender_video(video_path, video_file, srt_file, output_folder="outputs", soft_tracks=None):
+    """
+    Rebuild a history entry's evicted video from its re-uploaded original and
+    kept SRT(s). Transcription and rewriting are skipped.
+
+    Burn-in entries get the SRT burned in again; soft-subtitle entries pass
+    soft_tracks ({lang: srt_file}, in track order) and are re-muxed instead.
+    """
+    output_video = os.path.join(output_folder, video_file)
+    if soft_tracks:
+        from scripts.subtitle_mux import mux_soft_subtitles, SubtitleMuxError
+        try:
+            mux_soft_subtitles(
+                video_path,
+                {lang: os.path.join(output_folder, srt) for lang, srt in soft_tracks.items()},
+                output_video,
+            )
+        except SubtitleMuxError as e:
+            raise PipelineError(str(e))
+    else:
+        from scripts.overlay import overlay_captions
+        overlay_captions(video_path, os.path.join(output_folder, srt_file), output_video)
+    mark_video_restored(video_file, os.path.getsize(output_video))
+    return {'kind': 'rerender', 'video_file': video_file, 'srt_file': srt_file}
@@ -0,0 +1,145 @@
+from PIL import ImageFont
+
+CAPTION_FONT_SIZE = 40
+CAPTION_PADDING = 10          # Background box padding around the text (px)
+CAPTION_SIDE_MARGIN = 0.05    # Fraction of frame width kept clear on each side
+MIN_CUE_DURATION = 0.5        # Seconds a cue stays on screen at minimum
+CHAR_WIDTH_FACTOR = 0.6       # Average glyph width / font size when no font is available
+TEXT_ONLY_MAX_CHARS = 42      # Line length for caption files with no video to fit (readability limit)
+
+_font_cache = {}
+
+
+def load_caption_font(fontsize=CAPTION_FONT_SIZE):
+    """Load (and cache) the caption font, falling back to PIL's default"""
+    if fontsize in _font_cache:
+        return _font_cache[fontsize]
+
+    font = None
+    # Try common Windows fonts first, then common Linux/macOS ones
+    for candidate in ("arial.ttf", "C:/Windows/Fonts/arial.ttf",
+                      "DejaVuSans.ttf", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+                      "/Library/Fonts/Arial.ttf"):
+        try:
+            font = ImageFont.truetype(candidate, fontsize)
+            break
+        except OSError:
+            continue
+    if font is None:
+        # Fallback to default font
+        font = ImageFont.load_default()
+
+    _font_cache[fontsize] = font
+    return font
+
+
+def text_width(font, text):
+    """Rendered width of text in pixels"""
+    try:
+        return font.getlength(text)
+    except AttributeError:
+        # Pillow < 8
+        return font.getsize(text)[0]
+
+
+def break_lines(text, measure, max_width):
+    """
+    Split text into lines no wider than max_width using minimum-raggedness
+    line breaking (dynamic programming over all break points).
+
+    Every line's leftover space is squared and summed, so the result is the
+    most balanced set of lines rather than the greedy "fill then spill" split.
+    A single word wider than max_width gets a line of its own.
+
+    Args:
+        text (str): Caption text.
+        measure (callable): Returns the width of a string (pixels or chars).
+        max_width (float): Available line width in the same unit.
+    """
+    words = text.split()
+    if not words:
+        return []
+
+    n = len(words)
+    widths = [measure(w) for w in words]
+    space = measure(" ")
+
+    # cost[j] = best cost of laying out words[:j]; start[j] = first word of its last line
+    cost = [0.0] + [float("inf")] * n
+    start = [0] * (n + 1)
+
+    for j in range(1, n + 1):
+        line_width = -space
+        for i in range(j - 1, -1, -1):
+            line_width += widths[i] + space
+            if line_width > max_width and i < j - 1:
+                break
+            slack = max_width - line_width
+            candidate = cost[i] + slack * slack
+            if candidate < cost[j]:
+                cost[j] = candidate
+                start[j] = i
+
+    lines = []
+    j = n
+    while j > 0:
+        i = start[j]
+        lines.append(" ".join(words[i:j]))
+        j = i
+    lines.reverse()
+    return lines
+
+
+def layout_captions(segments, frame_width=None, fontsize=CAPTION_FONT_SIZE, max_chars=80):
+    """
+    Compute line breaks and timing for every caption once.
+
+    With a frame_width the lines are fitted to the rendered caption band using
+    real font metrics; without one they are fitted to max_chars characters.
+    The result is consumed directly by the SRT writer and the overlay renderer.
+
+    Args:
+        segments (list): List of dicts with 'start', 'end', 'text'.
+        frame_width (int): Video width in pixels, or None for text-only output.
+        fontsize (int): Caption font size used for measuring.
+        max_chars (int): Characters per line when frame_width is None.
+
+    Returns:
+        list: Cue dicts with 'index', 'start', 'end', 'text' and 'lines'.
+    """
+    if frame_width:
+        font = load_caption_font(fontsize)
+        measure = lambda s: text_width(font, s)
+        max_width = frame_width * (1 - 2 * CAPTION_SIDE_MARGIN) - 2 * CAPTION_PADDING
+    else:
+        measure = len
+        max_width = max_chars
+
+    captions = []
+    for seg in segments:
+        text = " ".join(seg["text"].split())
+        if not text:
+            continue
+        captions.append({
+            "index": len(captions) + 1,
+            "start": float(seg["start"]),
+            "end": float(seg["end"]),
+            "text": text,
+            "lines": break_lines(text, measure, max_width),
+        })
+
+    # Timing: enforce a minimum display time without overlapping the next cue
+    for cue, nxt in zip(captions, captions[1:] + [None]):
+        end = max(cue["end"], cue["start"] + MIN_CUE_DURATION)
+        if nxt is not None:
+            end = min(end, nxt["start"])
+        cue["end"] = max(end, cue["start"])
+
+    return captions
+
+
+def probe_frame_size(video_path):
+    """Read a video's (width, height) from its header without decoding frames"""
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    infos = ffmpeg_parse_infos(video_path)
+    return tuple(infos["video_size"])
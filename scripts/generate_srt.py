@@ -1,39 +1,119 @@
 import pysrt
 
-def segments_to_srt(segments, output_path, max_line_length=80):
+try:
+    from scripts.caption_layout import layout_captions
+except ImportError:
+    from caption_layout import layout_captions
+
+
+def write_srt(captions, output_path):
     """
-    Convert transcribed segments to an SRT file with properly synced timestamps.
-    
-    Args:
-        segments (list): List of dicts with 'start', 'end', 'text'.
-        output_path (str): Path to save the output SRT file.
-        max_line_length (int): Optional max characters per line for better readability.
+    Export laid-out captions (see caption_layout.layout_captions) as an SRT file.
+
+    The line breaks are written exactly as computed, so the SRT matches the
+    captions burned into the video.
     """
     subs = pysrt.SubRipFile()
 
-    for i, seg in enumerate(segments, start=1):
-        text = seg['text'].strip()
-
-        # Optionally wrap long lines for readability
-        if len(text) > max_line_length:
-            lines = []
-            while len(text) > max_line_length:
-                split_at = text.rfind(' ', 0, max_line_length)
-                if split_at == -1:
-                    split_at = max_line_length
-                lines.append(text[:split_at])
-                text = text[split_at:].strip()
-            lines.append(text)
-            text = '\n'.join(lines)
-
+    for cue in captions:
         subs.append(
             pysrt.SubRipItem(
-                index=i,
-                start=pysrt.SubRipTime(seconds=seg['start']),
-                end=pysrt.SubRipTime(seconds=seg['end']),
-                text=text
+                index=cue['index'],
+                start=pysrt.SubRipTime(seconds=cue['start']),
+                end=pysrt.SubRipTime(seconds=cue['end']),
+                text='\n'.join(cue['lines'])
             )
         )
 
     subs.save(output_path, encoding='utf-8')
     print(f"✅ SRT saved: {output_path}")
+
+
+def _timestamp(seconds, separator, hour_digits=2, fraction_digits=3):
+    """12.5 -> '00:00:12.500' (VTT) / '0:00:12.50' (ASS)"""
+    units = 10 ** fraction_digits
+    total = int(round(seconds * units))
+    hours, rest = divmod(total, 3600 * units)
+    minutes, rest = divmod(rest, 60 * units)
+    secs, fraction = divmod(rest, units)
+    return f"{hours:0{hour_digits}d}:{minutes:02d}:{secs:02d}{separator}{fraction:0{fraction_digits}d}"
+
+
+def _vtt_escape(line):
+    """WebVTT cue text is markup: escape &, < and > (the latter also defuses a stray '-->')"""
+    return line.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def write_vtt(captions, output_path):
+    """Export laid-out captions as a WebVTT file (same cues and line breaks as the SRT)"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("WEBVTT\n\n")
+        for cue in captions:
+            f.write(f"{cue['index']}\n")
+            f.write(f"{_timestamp(cue['start'], '.')} --> {_timestamp(cue['end'], '.')}\n")
+            f.write('\n'.join(_vtt_escape(line) for line in cue['lines']) + "\n\n")
+    print(f"✅ VTT saved: {output_path}")
+
+
+def write_ass(captions, output_path, play_res=(1280, 720)):
+    """
+    Export laid-out captions as an ASS file styled like the burned-in captions:
+    white text on a semi-transparent black box, centred at the bottom.
+    """
+    width, height = play_res
+    header = (
+        "[Script Info]\n"
+        "ScriptType: v4.00+\n"
+        f"PlayResX: {width}\n"
+        f"PlayResY: {height}\n"
+        "WrapStyle: 2\n"
+        "\n"
+        "[V4+ Styles]\n"
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, "
+        "Shadow, Alignment, MarginL, MarginR, MarginV, Encoding\n"
+        # BorderStyle 3 = opaque box; &H66 alpha on the box is 60% opaque black
+        "Style: Default,Arial,40,&H00FFFFFF,&H00FFFFFF,&H66000000,&H66000000,"
+        "0,0,0,0,100,100,0,0,3,10,0,2,20,20,30,1\n"
+        "\n"
+        "[Events]\n"
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text\n"
+    )
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(header)
+        for cue in captions:
+            text = '\\N'.join(line.replace('{', '(').replace('}', ')') for line in cue['lines'])
+            f.write(f"Dialogue: 0,{_timestamp(cue['start'], '.', 1, 2)},{_timestamp(cue['end'], '.', 1, 2)},"
+                    f"Default,,0,0,0,,{text}\n")
+    print(f"✅ ASS saved: {output_path}")
+
+
+# Extra caption formats a job can ask for besides SRT
+CAPTION_WRITERS = {
+    'vtt': write_vtt,
+    'ass': write_ass,
+}
+
+
+def read_srt(srt_path):
+    """Load an SRT file back into segment dicts with 'start', 'end', 'text'."""
+    return [
+        {
+            'start': sub.start.ordinal / 1000.0,
+            'end': sub.end.ordinal / 1000.0,
+            'text': ' '.join(sub.text.split())
+        }
+        for sub in pysrt.open(srt_path, encoding='utf-8')
+    ]
+
+
+def segments_to_srt(segments, output_path, max_line_length=80):
+    """
+    Convert transcribed segments to an SRT file with properly synced timestamps.
+
+    Args:
+        segments (list): List of dicts with 'start', 'end', 'text'.
+        output_path (str): Path to save the output SRT file.
+        max_line_length (int): Optional max characters per line for better readability.
+    """
+    write_srt(layout_captions(segments, max_chars=max_line_length), output_path)
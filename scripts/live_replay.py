@@ -0,0 +1,142 @@
+"""
+Replay a video's audio into the live captioning server at real-time speed
+and measure caption lag.
+
+    python live_server.py --port 5001 &
+    python scripts/live_replay.py --video "examples/<sample>.mp4"
+
+Lag for a caption = when it arrived - when its last word was spoken
+(stream start + segment end on the replay clock).
+
+--device streams a capture device instead (e.g. "alsa:default",
+"dshow:audio=Microphone"); the device itself paces the stream.
+"""
+import argparse
+import json
+import subprocess
+import threading
+import time
+
+import simple_websocket
+
+from preview import ffmpeg_exe
+
+SAMPLE_RATE = 16000
+CHUNK_SECONDS = 0.1
+
+
+def decode_audio(video_path):
+    """Whole audio track as 16 kHz mono s16le bytes"""
+    cmd = [ffmpeg_exe(), "-loglevel", "error", "-i", video_path,
+           "-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    return subprocess.run(cmd, check=True, stdout=subprocess.PIPE).stdout
+
+
+def open_device(device):
+    """ffmpeg process writing 16 kHz mono s16le from a capture device ("format:name")"""
+    fmt, name = device.split(":", 1)
+    cmd = [ffmpeg_exe(), "-loglevel", "error", "-f", fmt, "-i", name,
+           "-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le", "-"]
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE)
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video into the live captioning server")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--video", help="Video whose audio track is streamed")
+    source.add_argument("--device", help="Capture device as format:name, e.g. alsa:default")
+    parser.add_argument("--url", default="ws://127.0.0.1:5001/ws/live", help="Live server WebSocket URL")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed (1.0 = real time)")
+    parser.add_argument("--style", default=None, help="Also rewrite finalized captions in this style")
+    args = parser.parse_args()
+
+    if args.device:
+        args.speed = 1.0
+        capture = open_device(args.device)
+        print(f"🎙️  Streaming {args.device} → {args.url} (Ctrl+C to stop)")
+    else:
+        pcm = decode_audio(args.video)
+        duration = len(pcm) / 2 / SAMPLE_RATE
+        print(f"🎧 Streaming {duration:.1f}s of audio at {args.speed}x → {args.url}")
+
+    url = args.url + (f"?style={args.style}" if args.style else "")
+    ws = simple_websocket.Client(url)
+    events = []
+    done = threading.Event()
+    stream_start = None
+
+    def receiver():
+        while True:
+            try:
+                message = ws.receive()
+            except simple_websocket.ConnectionClosed:
+                break
+            event = json.loads(message)
+            event['received_at'] = time.time()
+            if event['type'] == 'done':
+                break
+            events.append(event)
+            if event['type'] == 'final':
+                lag = event['received_at'] - (stream_start + event['end'] / args.speed)
+                print(f"  ✅ [{event['start']:6.1f}-{event['end']:6.1f}] lag {lag:5.2f}s  {event['text']}")
+            elif event['type'] == 'rewrite':
+                print(f"  ✨ #{event['id']}: {event['text']}")
+            elif event['type'] == 'error':
+                print(f"  ❌ {event['message']}")
+        done.set()
+
+    chunk_bytes = int(CHUNK_SECONDS * SAMPLE_RATE) * 2
+    stream_start = time.time()
+    threading.Thread(target=receiver, daemon=True).start()
+
+    if args.device:
+        try:
+            while True:
+                chunk = capture.stdout.read(chunk_bytes)
+                if not chunk:
+                    break
+                ws.send(chunk)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            capture.terminate()
+    else:
+        # Pace chunks against the wall clock so slow sends don't accumulate drift
+        for i, offset in enumerate(range(0, len(pcm), chunk_bytes)):
+            target = stream_start + i * CHUNK_SECONDS / args.speed
+            delay = target - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            ws.send(pcm[offset:offset + chunk_bytes])
+    stream_end = time.time()
+    ws.send("end")
+    done.wait(timeout=120)
+    ws.close()
+
+    finals = [e for e in events if e['type'] == 'final']
+    provisionals = [e for e in events if e['type'] == 'provisional']
+    # Don't count the end-of-stream flush: those captions are final only because the stream stopped
+    live_finals = [e for e in finals if e['received_at'] <= stream_end]
+    lags = [e['received_at'] - (stream_start + e['end'] / args.speed) for e in live_finals]
+    first_seen = [e['received_at'] - (stream_start + e['end'] / args.speed) for e in provisionals]
+
+    print("\n" + "="*60)
+    print("📊 LIVE CAPTION LAG")
+    print("="*60)
+    print(f"   Final captions:       {len(finals)} ({len(live_finals)} during the stream)")
+    print(f"   Provisional updates:  {len(provisionals)}")
+    print(f"   Final lag p50/p95/max:       {percentile(lags, 50):.2f}s / {percentile(lags, 95):.2f}s / {max(lags, default=float('nan')):.2f}s")
+    print(f"   Provisional lag p50/p95:     {percentile(first_seen, 50):.2f}s / {percentile(first_seen, 95):.2f}s")
+    print("="*60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    from scripts.transcribe import load_whisper_model
+    from scripts.rewrite_backends import rewrite_caption
+except ImportError:
+    from transcribe import load_whisper_model
+    from rewrite_backends import rewrite_caption
+
+SAMPLE_RATE = 16000           # faster-whisper expects 16 kHz mono float32
+MIN_STEP_SECONDS = 1.0        # Decode again once this much new audio has arrived
+COMMIT_MARGIN_SECONDS = 2.0   # Segments ending this far before the live edge are final
+MAX_WINDOW_SECONDS = 20.0     # Force-commit so the decoded window never grows past this
+
+
+class IncrementalTranscriber:
+    """
+    Sliding-window streaming transcription with faster-whisper.
+
+    Audio is appended with feed(). Each process() call decodes the
+    uncommitted window; segments that end well before the live edge are
+    stable and emitted as "final" (the window then slides past them), while
+    the tail is emitted as one "provisional" caption that later decodes
+    may revise.
+    """
+
+    def __init__(self, model_size="base", language="en", beam_size=1,
+                 min_step=MIN_STEP_SECONDS, commit_margin=COMMIT_MARGIN_SECONDS,
+                 max_window=MAX_WINDOW_SECONDS):
+        self.model, _, _ = load_whisper_model(model_size)
+        self.language = language
+        self.beam_size = beam_size  # Greedy by default: latency matters more than the last % of accuracy
+        self.min_step = min_step
+        self.commit_margin = commit_margin
+        self.max_window = max_window
+
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_start = 0.0       # Audio time (s) of buffer[0]
+        self._decoded_until = 0       # len(buffer) at the last decode
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    @property
+    def audio_time(self):
+        """Seconds of audio received so far"""
+        return self.buffer_start + len(self.buffer) / SAMPLE_RATE
+
+    def feed(self, pcm):
+        """Append audio: raw s16le bytes or a float32 numpy array"""
+        if isinstance(pcm, (bytes, bytearray, memoryview)):
+            pcm = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        with self._lock:
+            self.buffer = np.concatenate([self.buffer, pcm.astype(np.float32, copy=False)])
+
+    def ready(self):
+        """True once enough new audio has arrived to be worth decoding"""
+        with self._lock:
+            return len(self.buffer) - self._decoded_until >= self.min_step * SAMPLE_RATE
+
+    def process(self, flush=False):
+        """
+        Decode the current window and return caption events.
+
+        Args:
+            flush (bool): End of stream - finalize everything.
+
+        Returns:
+            list: Dicts with 'type' ('final' | 'provisional'), 'id', 'start',
+                'end', 'text' and 'audio_time'.
+        """
+        with self._lock:
+            audio = self.buffer
+            offset = self.buffer_start
+            self._decoded_until = len(audio)
+        if len(audio) == 0:
+            return []
+
+        segments, _ = self.model.transcribe(
+            audio,
+            language=self.language,
+            beam_size=self.beam_size,
+            vad_filter=True,
+            vad_parameters=dict(min_silence_duration_ms=300),
+            condition_on_previous_text=False,
+        )
+        segments = [
+            (offset + s.start, offset + s.end, s.text.strip())
+            for s in segments if s.text.strip()
+        ]
+
+        window_end = offset + len(audio) / SAMPLE_RATE
+        window_too_long = window_end - offset > self.max_window
+        events = []
+        commit_until = None
+        pending = []
+
+        for i, (start, end, text) in enumerate(segments):
+            is_last = i == len(segments) - 1
+            if flush or end <= window_end - self.commit_margin or (window_too_long and not is_last):
+                events.append({'type': 'final', 'id': self._next_id, 'start': start, 'end': end, 'text': text})
+                self._next_id += 1
+                commit_until = end
+            else:
+                pending.append((start, end, text))
+
+        if pending:
+            events.append({
+                'type': 'provisional',
+                'id': self._next_id,
+                'start': pending[0][0],
+                'end': pending[-1][1],
+                'text': ' '.join(t for _, _, t in pending),
+            })
+
+        # Slide the window past committed audio (or past long silence)
+        if commit_until is None and not segments and window_too_long:
+            commit_until = window_end - self.commit_margin
+        if commit_until is not None:
+            with self._lock:
+                drop = int(round((commit_until - self.buffer_start) * SAMPLE_RATE))
+                drop = max(0, min(drop, len(self.buffer)))
+                self.buffer = self.buffer[drop:]
+                self.buffer_start += drop / SAMPLE_RATE
+                self._decoded_until = max(0, self._decoded_until - drop)
+
+        for event in events:
+            event['audio_time'] = window_end
+        return events
+
+
+class LiveCaptionSession:
+    """
+    One live stream: decodes on a background thread and reports events via
+    emit(event). Finalized captions can be rewritten asynchronously; the
+    rewrite arrives later as a 'rewrite' event carrying the same id. A decode
+    that fails is logged and reported as an 'error' event; the stream keeps
+    going with the next window.
+    """
+
+    def __init__(self, emit, model_size="base", language="en", style=None, lang="en"):
+        self.emit = emit
+        self.transcriber = IncrementalTranscriber(model_size=model_size, language=language)
+        self.style = style
+        self.lang = lang
+        self._rewriter = ThreadPoolExecutor(max_workers=2) if style else None
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._decode_loop, name="live-decoder", daemon=True)
+        self._thread.start()
+
+    def feed(self, pcm):
+        self.transcriber.feed(pcm)
+
+    def _publish(self, events):
+        for event in events:
+            event['emitted_at'] = time.time()
+            self.emit(event)
+            if event['type'] == 'final' and self._rewriter is not None:
+                self._rewriter.submit(self._rewrite, event)
+
+    def _rewrite(self, event):
+        try:
+            text = rewrite_caption(event['text'], style=self.style, lang=self.lang).text
+        except Exception as e:
+            print(f"⚠️ Live rewrite failed: {e}")
+            return
+        self.emit({'type': 'rewrite', 'id': event['id'], 'text': text, 'emitted_at': time.time()})
+
+    def _decode(self, flush=False):
+        try:
+            self._publish(self.transcriber.process(flush=flush))
+        except Exception as e:
+            # An uncaught error would end the decoder thread and leave the client waiting
+            print(f"❌ Live decode failed: {e}")
+            self.emit({'type': 'error', 'message': "Couldn't decode the latest audio", 'emitted_at': time.time()})
+
+    def _decode_loop(self):
+        while not self._closed.is_set():
+            if self.transcriber.ready():
+                self._decode()
+            else:
+                time.sleep(0.05)
+
+    def close(self):
+        """End of stream: finalize the tail and wait for pending rewrites"""
+        self._closed.set()
+        self._thread.join()
+        self._decode(flush=True)
+        if self._rewriter is not None:
+            self._rewriter.shutdown(wait=True)
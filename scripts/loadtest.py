@@ -0,0 +1,207 @@
+"""
+Offline load test: many concurrent uploads against the Flask app, with a
+local Gemini stand-in (scripts/mock_gemini.py) instead of the real API.
+
+    python scripts/loadtest.py --jobs 40 --concurrency 8 --keys 5 --rpm 10 --error-rate-429 0.05
+
+Tiny synthetic videos (a small solid-colour picture over a few seconds of
+speech cut from the sample in examples/) are uploaded through the app's
+own upload route using Flask's test client, so the full inline pipeline
+runs: Whisper, Gemini key rotation, layout, render. Everything runs in a
+scratch directory, so the real database, outputs and key usage files are
+never touched. The Whisper model must already be in the local cache.
+
+Reports job throughput, per-stage latency percentiles, how many API keys
+the rotation disabled, what the mock served (including 429s) and failures.
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_gemini import add_mock_arguments, mock_from_args
+from preview import ffmpeg_exe
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from admission import probe_duration
+STAGES = ["transcribe", "rewrite", "srt", "render", "total"]
+MAX_GEMINI_KEYS = 28  # rewrite_captions_gemini reads GEMINI_API_KEY_1..28
+
+
+def percentile(values, pct):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def make_clips(sample, folder, count, seconds):
+    """Tiny 320x180 videos, each with a different slice of the sample's speech"""
+    clips = []
+    # Wrap around short samples so every clip gets a full slice of audio
+    span = max((probe_duration(sample) or seconds) - seconds, 0.0)
+    for i in range(count):
+        path = os.path.join(folder, f"clip_{i}.mp4")
+        subprocess.run([
+            ffmpeg_exe(), "-y", "-loglevel", "error",
+            "-f", "lavfi", "-i", f"color=c=0x{(i * 0x2F4F6F) % 0xFFFFFF:06x}:s=320x180:r=15",
+            "-ss", f"{(i * seconds) % span if span else 0:.2f}", "-t", f"{seconds:.2f}", "-i", sample,
+            "-map", "0:v", "-map", "1:a", "-shortest",
+            "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path,
+        ], check=True)
+        clips.append(path)
+    return clips
+
+
+def configure_environment(workdir, mock_url, keys, args):
+    """Env for the app under test; must run before it is imported"""
+    os.environ["GEMINI_API_ENDPOINT"] = mock_url
+    for i in range(1, MAX_GEMINI_KEYS + 1):
+        # Empty values also stop python-dotenv from loading real keys from .env
+        os.environ[f"GEMINI_API_KEY_{i}"] = f"mock-key-{i:02d}" if i <= keys else ""
+    os.environ["GEMINI_DISABLED_KEYS_FILE"] = os.path.join(workdir, "disabled_keys.json")
+    os.environ["GEMINI_USAGE_FILE"] = os.path.join(workdir, "usage_counts.json")
+    os.environ["GEMINI_RETRY_WAIT_SECONDS"] = str(args.retry_wait)
+    os.environ["REWRITE_BACKEND"] = args.backend
+    os.environ["PREVIEW_RENDITIONS"] = "1" if args.previews else "0"
+    os.environ["HF_HUB_OFFLINE"] = "1"  # Fail fast instead of downloading a model
+    # The app runs inside the scratch dir; keep using this host's autotuned Whisper settings
+    os.environ.setdefault("WHISPER_TUNING_FILE", os.path.join(REPO_ROOT, "whisper_tuning.json"))
+
+
+def run_job(flask_app, clip, args):
+    """Upload one clip as a guest and collect the outcome"""
+    client = flask_app.test_client()
+    start = time.time()
+    with open(clip, "rb") as f:
+        response = client.post("/", data={
+            "video": (f, os.path.basename(clip)),
+            "style": args.style,
+            "lang": args.lang,
+            "speed": args.speed,
+        }, content_type="multipart/form-data")
+    latency = time.time() - start
+
+    with client.session_transaction() as sess:
+        result = sess.get("result")
+        flashes = [message for _, message in sess.get("_flashes", [])]
+    if response.status_code == 302 and response.location.endswith("/result") and result:
+        return {"ok": True, "latency": latency, "timings": result.get("timings", {})}
+    return {"ok": False, "latency": latency, "error": flashes[0] if flashes else f"HTTP {response.status_code}"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with a mock Gemini API")
+    parser.add_argument("--jobs", type=int, default=20, help="Uploads to run")
+    parser.add_argument("--concurrency", type=int, default=4, help="Uploads in flight at once")
+    parser.add_argument("--keys", type=int, default=5, help="Mock API keys in the rotation")
+    parser.add_argument("--clip-seconds", type=float, default=4, help="Length of each synthetic video")
+    parser.add_argument("--clips", type=int, default=4, help="Distinct synthetic videos to cycle through")
+    parser.add_argument("--sample", default=None, help="Speech source (default: first video in examples/)")
+    parser.add_argument("--style", default="casual")
+    parser.add_argument("--lang", default="en")
+    parser.add_argument("--speed", default="tiny", help="Whisper model size")
+    parser.add_argument("--backend", default="auto", help="REWRITE_BACKEND for the run (auto falls back to offline)")
+    parser.add_argument("--retry-wait", type=float, default=0.5, help="Seconds between Gemini retries")
+    parser.add_argument("--previews", action="store_true", help="Also build poster/sprite/preview renditions")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    sample = args.sample or next(iter(sorted(glob.glob(os.path.join(REPO_ROOT, "examples", "*.mp4")))), None)
+    if not sample:
+        raise SystemExit("❌ No sample video found in examples/; pass --sample")
+    sample = os.path.abspath(sample)
+
+    workdir = tempfile.mkdtemp(prefix="caption_loadtest_")
+    mock = mock_from_args(args).start()
+    configure_environment(workdir, mock.url, args.keys, args)
+
+    print("="*60)
+    print("🧪 CAPTION PIPELINE LOAD TEST (offline)")
+    print("="*60)
+    print(f"🗂️  Scratch dir: {workdir}")
+    print(f"🤖 Mock Gemini: {mock.url} ({args.keys} keys, {args.rpm} rpm/key, quota {args.daily_quota}/key)")
+    print(f"⏱️  Latency: {args.latency_ms:.0f}ms median, jitter {args.jitter}, "
+          f"429s {args.error_rate_429:.0%}, 500s {args.error_rate_500:.0%}")
+    print(f"📦 {args.jobs} uploads, {args.concurrency} at a time, model {args.speed}")
+
+    os.chdir(workdir)
+    clips = make_clips(sample, workdir, args.clips, args.clip_seconds)
+
+    # Imported only now: the app and the Gemini module read the environment at import time
+    import app as webapp
+    from scripts.transcribe import load_whisper_model
+    webapp.app.config["TESTING"] = True
+    load_whisper_model(args.speed)  # Model load isn't part of any job's latency
+
+    outcomes = []
+    outcomes_lock = threading.Lock()
+
+    def job(i):
+        outcome = run_job(webapp.app, clips[i % len(clips)], args)
+        with outcomes_lock:
+            outcomes.append(outcome)
+            done = len(outcomes)
+        print(f"   {'✅' if outcome['ok'] else '❌'} {done}/{args.jobs} in {outcome['latency']:.1f}s"
+              + ("" if outcome['ok'] else f": {outcome['error'][:80]}"))
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(job, range(args.jobs)))
+    elapsed = time.time() - start
+
+    mock_stats = mock.snapshot()
+    mock.stop()
+    disabled_file = os.environ["GEMINI_DISABLED_KEYS_FILE"]
+    disabled = set()
+    if os.path.exists(disabled_file):
+        with open(disabled_file) as f:
+            disabled = {k for keys in json.load(f).values() for k in keys}
+
+    ok = [o for o in outcomes if o["ok"]]
+    failures = Counter(o["error"] for o in outcomes if not o["ok"])
+
+    print("\n" + "="*60)
+    print("📊 LOAD TEST REPORT")
+    print("="*60)
+    print(f"   Wall time:      {elapsed:.1f}s")
+    print(f"   Throughput:     {len(ok) / elapsed * 60:.1f} jobs/min ({len(ok)}/{len(outcomes)} succeeded)")
+    print(f"   Failure rate:   {(len(outcomes) - len(ok)) / max(1, len(outcomes)):.1%}")
+    print(f"   Upload latency: p50 {percentile([o['latency'] for o in outcomes], 50):.1f}s  "
+          f"p95 {percentile([o['latency'] for o in outcomes], 95):.1f}s")
+    print("\n   Stage latency (s)     p50      p95      p99      max")
+    for stage in STAGES:
+        values = [o["timings"][stage] for o in ok if stage in o["timings"]]
+        print(f"   {stage:<18} {percentile(values, 50):7.2f}  {percentile(values, 95):7.2f}  "
+              f"{percentile(values, 99):7.2f}  {max(values, default=float('nan')):7.2f}")
+    print(f"\n   Keys disabled:  {len(disabled)}/{args.keys}")
+    print(f"   Mock requests:  {mock_stats.get('requests', 0)} "
+          f"(ok {mock_stats.get('ok', 0)}, rpm 429 {mock_stats.get('rate_limited', 0)}, "
+          f"quota 429 {mock_stats.get('quota_exhausted', 0)}, injected 429 {mock_stats.get('injected_429', 0)}, "
+          f"500 {mock_stats.get('injected_500', 0)})")
+    if failures:
+        print("\n   Failures:")
+        for error, count in failures.most_common():
+            print(f"     {count:>4} × {error[:90]}")
+    print("="*60)
+
+    os.chdir(REPO_ROOT)
+    if args.keep:
+        print(f"🗂️  Kept {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Local stand-in for the Gemini generateContent REST API, for load tests.
+
+Simulates what matters for key rotation: response latency, per-key
+requests-per-minute limits, per-key daily quotas and injected errors.
+Replies echo the caption text from the prompt, so no real model is needed
+and nothing leaves the machine.
+
+    python scripts/mock_gemini.py --port 8765 --rpm 10 --daily-quota 500 --error-rate-429 0.02
+
+Point the app at it with GEMINI_API_ENDPOINT=http://127.0.0.1:8765.
+GET /stats returns the counters as JSON.
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+_generate_path_re = re.compile(r"^/v1(?:beta)?/models/([^/:]+):generateContent$")
+_caption_re = re.compile(r"Text: '(.*)'", re.DOTALL)
+
+
+class MockGeminiServer:
+    """
+    Threaded HTTP server speaking enough of the Gemini REST API for the
+    generative-service client's "rest" transport.
+
+    Args:
+        latency_ms (float): Median response latency.
+        jitter (float): Log-normal sigma of the latency (0 = fixed).
+        tail_rate (float): Fraction of requests that take tail_ms instead.
+        tail_ms (float): Latency of those slow requests.
+        rpm (int): Requests per minute allowed per key (0 = unlimited).
+        daily_quota (int): Requests per key for the whole run (0 = unlimited).
+        error_rate_429 (float): Fraction of requests answered with a spurious 429.
+        error_rate_500 (float): Fraction of requests answered with a 500.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, latency_ms=600, jitter=0.4, tail_rate=0.0,
+                 tail_ms=5000, rpm=10, daily_quota=500, error_rate_429=0.0, error_rate_500=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_ms = tail_ms
+        self.rpm = rpm
+        self.daily_quota = daily_quota
+        self.error_rate_429 = error_rate_429
+        self.error_rate_500 = error_rate_500
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = defaultdict(deque)   # key -> timestamps of the last minute's requests
+        self._used = defaultdict(int)       # key -> requests counted against the daily quota
+        self.stats = defaultdict(int)
+        self.per_key = defaultdict(lambda: defaultdict(int))
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-gemini", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                **dict(self.stats),
+                'per_key': {k: dict(v) for k, v in self.per_key.items()},
+            }
+
+    def _latency(self):
+        if self._random.random() < self.tail_rate:
+            return self.tail_ms / 1000
+        return self.latency_ms * math.exp(self.jitter * self._random.gauss(0, 1)) / 1000
+
+    def admit(self, key):
+        """Decide a request's fate: (status, error message or None, latency seconds)"""
+        now = time.time()
+        with self._lock:
+            self.stats['requests'] += 1
+            self.per_key[key]['requests'] += 1
+
+            if self.daily_quota and self._used[key] >= self.daily_quota:
+                outcome = (429, "Quota exceeded for quota metric 'Generate Content requests per day'", 'quota_exhausted')
+            else:
+                recent = self._recent[key]
+                while recent and now - recent[0] >= 60:
+                    recent.popleft()
+                if self.rpm and len(recent) >= self.rpm:
+                    outcome = (429, "Quota exceeded for quota metric 'Generate Content requests per minute'", 'rate_limited')
+                else:
+                    roll = self._random.random()
+                    if roll < self.error_rate_429:
+                        outcome = (429, "Resource has been exhausted (e.g. check quota).", 'injected_429')
+                    elif roll < self.error_rate_429 + self.error_rate_500:
+                        outcome = (500, "An internal error has occurred.", 'injected_500')
+                    else:
+                        outcome = (200, None, 'ok')
+                    # Every request that reaches the model counts against the quotas
+                    recent.append(now)
+                    self._used[key] += 1
+
+            status, message, counter = outcome
+            self.stats[counter] += 1
+            self.per_key[key][counter] += 1
+            latency = self._latency() if status == 200 else 0.02
+        return status, message, latency
+
+    def _handler_class(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_):
+                pass  # Thousands of requests per run: keep the console for the report
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if urlparse(self.path).path == "/stats":
+                    self._send_json(200, mock.snapshot())
+                else:
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)) or 0)
+                if not _generate_path_re.match(url.path):
+                    self._send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+                    return
+
+                key = self.headers.get("x-goog-api-key") or parse_qs(url.query).get("key", [""])[0]
+                if not key:
+                    self._send_json(403, {"error": {"code": 403, "message": "API key missing", "status": "PERMISSION_DENIED"}})
+                    return
+
+                status, message, latency = mock.admit(key)
+                time.sleep(latency)
+                if status != 200:
+                    self._send_json(status, {"error": {
+                        "code": status,
+                        "message": message,
+                        "status": "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL",
+                    }})
+                    return
+
+                try:
+                    prompt = "".join(
+                        part.get("text", "")
+                        for content in json.loads(body).get("contents", [])
+                        for part in content.get("parts", [])
+                    )
+                except ValueError:
+                    prompt = ""
+                match = _caption_re.search(prompt)
+                text = match.group(1).strip() if match else prompt.strip()
+                self._send_json(200, {
+                    "candidates": [{
+                        "content": {"parts": [{"text": text}], "role": "model"},
+                        "finishReason": "STOP",
+                        "index": 0,
+                    }],
+                    "usageMetadata": {
+                        "promptTokenCount": len(prompt.split()),
+                        "candidatesTokenCount": len(text.split()),
+                        "totalTokenCount": len(prompt.split()) + len(text.split()),
+                    },
+                })
+
+        return Handler
+
+
+def add_mock_arguments(parser):
+    """Mock server options, shared with the load-test driver"""
+    parser.add_argument("--latency-ms", type=float, default=600, help="Median response latency")
+    parser.add_argument("--jitter", type=float, default=0.4, help="Log-normal sigma of the latency")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Fraction of very slow responses")
+    parser.add_argument("--tail-ms", type=float, default=5000, help="Latency of the slow responses")
+    parser.add_argument("--rpm", type=int, default=10, help="Requests per minute per key (0 = unlimited)")
+    parser.add_argument("--daily-quota", type=int, default=500, help="Requests per key per run (0 = unlimited)")
+    parser.add_argument("--error-rate-429", type=float, default=0.0, help="Fraction of spurious 429 replies")
+    parser.add_argument("--error-rate-500", type=float, default=0.0, help="Fraction of 500 replies")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed for latencies and errors")
+
+
+def mock_from_args(args, host="127.0.0.1", port=0):
+    return MockGeminiServer(
+        host=host, port=port, latency_ms=args.latency_ms, jitter=args.jitter,
+        tail_rate=args.tail_rate, tail_ms=args.tail_ms, rpm=args.rpm, daily_quota=args.daily_quota,
+        error_rate_429=args.error_rate_429, error_rate_500=args.error_rate_500, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gemini stand-in for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    mock = mock_from_args(args, args.host, args.port).start()
+    print(f"🧪 Mock Gemini listening on {mock.url} (GEMINI_API_ENDPOINT={mock.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(mock.snapshot(), indent=2))
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
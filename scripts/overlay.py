@@ -1,76 +1,132 @@
-from moviepy.editor import VideoFileClip, ImageClip, CompositeVideoClip
-import pysrt
-from PIL import Image, ImageDraw, ImageFont
+from bisect import bisect_right
+
+from moviepy.editor import VideoFileClip
+from PIL import Image, ImageDraw
 import numpy as np
-import textwrap
 
-def create_text_image(text, width, height, fontsize=40):
-    """Create an image with text using PIL"""
+try:
+    from scripts.caption_layout import layout_captions, load_caption_font, CAPTION_FONT_SIZE, CAPTION_PADDING
+    from scripts.generate_srt import read_srt
+except ImportError:
+    from caption_layout import layout_captions, load_caption_font, CAPTION_FONT_SIZE, CAPTION_PADDING
+    from generate_srt import read_srt
+
+def create_text_image(lines, width, height, font):
+    """Create an image with pre-wrapped caption lines using PIL"""
     # Create transparent image
     img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
-    
-    # Try to use a common font, fallback to default
-    try:
-        # Try common Windows fonts
-        font = ImageFont.truetype("arial.ttf", fontsize)
-    except:
-        try:
-            font = ImageFont.truetype("C:/Windows/Fonts/arial.ttf", fontsize)
-        except:
-            # Fallback to default font
-            font = ImageFont.load_default()
-    
-    # Wrap text to fit width
-    max_chars_per_line = int(width / (fontsize * 0.6))
-    wrapped_text = textwrap.fill(text, width=max_chars_per_line)
-    
+
+    # Lines were already broken by caption_layout for this frame width
+    wrapped_text = '\n'.join(lines)
+
     # Get text bounding box
     bbox = draw.textbbox((0, 0), wrapped_text, font=font)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
-    
+
     # Calculate position to center text
     x = (width - text_width) // 2
     y = (height - text_height) // 2
-    
+
     # Draw background rectangle
-    padding = 10
+    padding = CAPTION_PADDING
     draw.rectangle(
         [x - padding, y - padding, x + text_width + padding, y + text_height + padding],
         fill=(0, 0, 0, 153)  # Semi-transparent black
     )
-    
+
     # Draw text
     draw.text((x, y), wrapped_text, font=font, fill=(255, 255, 255, 255))
-    
+
     return np.array(img)
 
-def overlay_captions(video_path, srt_path, output_path="output.mp4"):
-    video = VideoFileClip(video_path)
-    subs = pysrt.open(srt_path)
-    
-    txt_clips = []
-    caption_height = int(video.h * 0.15)  # 15% of video height for captions
-    
-    for sub in subs:
-        # Create text image
-        text_img = create_text_image(
-            sub.text, 
-            video.w, 
-            caption_height,
-            fontsize=40
+class CaptionCompositor:
+    """
+    Burns cues into frames one at a time.
+
+    Cue start times are kept sorted, so the active cue for a timestamp is a
+    binary search away no matter how many cues there are. Each cue's bitmap
+    is rendered the first time it's shown, cropped to its background box and
+    stored with premultiplied alpha; only that box is blended, into a copy
+    of the frame. Bitmaps of cues that are no longer on screen are dropped, so
+    memory holds at most one caption.
+    """
+
+    def __init__(self, captions, frame_size, font):
+        self.width, self.height = frame_size
+        self.band_height = int(self.height * 0.15)  # 15% of video height for captions
+        self.font = font
+        self.cues = sorted((c for c in captions if c['end'] > c['start']), key=lambda c: c['start'])
+        self.starts = [c['start'] for c in self.cues]
+        self._bitmaps = {}
+
+    def active_cue(self, t):
+        """Index of the cue on screen at time t, or None"""
+        i = bisect_right(self.starts, t) - 1
+        if i >= 0 and t < self.cues[i]['end']:
+            return i
+        return None
+
+    def _render(self, i):
+        """(x, y, premultiplied rgb, inverse alpha) for cue i, cropped to its visible box"""
+        rgba = create_text_image(self.cues[i]['lines'], self.width, self.band_height, self.font)
+        rows = np.flatnonzero(rgba[:, :, 3].any(axis=1))
+        cols = np.flatnonzero(rgba[:, :, 3].any(axis=0))
+        if len(rows) == 0:
+            return None
+        rgba = rgba[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1].astype(np.uint16)
+        alpha = rgba[:, :, 3:4]
+        return (
+            int(cols[0]),
+            self.height - self.band_height + int(rows[0]),
+            rgba[:, :, :3] * alpha,
+            255 - alpha,
         )
-        
-        # Create ImageClip from the text image
-        txt_clip = ImageClip(text_img, duration=sub.end.seconds - sub.start.seconds)
-        txt_clip = txt_clip.set_start(sub.start.seconds).set_position(('center', 'bottom'))
-        txt_clips.append(txt_clip)
-    
-    # Composite the video and text clips
-    final = CompositeVideoClip([video, *txt_clips])
-    
-    # Add back the original audio
-    final = final.set_audio(video.audio)
-    
+
+    def bitmap(self, i):
+        if i not in self._bitmaps:
+            # Frames arrive in order, so anything else cached has scrolled off screen
+            self._bitmaps = {i: self._render(i)}
+        return self._bitmaps[i]
+
+    def __call__(self, get_frame, t):
+        frame = get_frame(t)
+        i = self.active_cue(t)
+        if i is None:
+            self._bitmaps.clear()
+            return frame
+        bitmap = self.bitmap(i)
+        if bitmap is None:
+            return frame
+
+        # Never blend into the reader's array: it may be read-only, or cached and
+        # handed back again for a repeated frame, which would darken the box twice
+        frame = frame.copy()
+        x, y, premultiplied, inverse_alpha = bitmap
+        region = frame[y:y + premultiplied.shape[0], x:x + premultiplied.shape[1]]
+        # uint16 math: region * (255 - a) + rgb * a never exceeds 255 * 255
+        region[...] = (region * inverse_alpha + premultiplied + 127) // 255
+        return frame
+
+
+def overlay_captions(video_path, captions, output_path="output.mp4"):
+    """
+    Burn captions into a video.
+
+    Args:
+        video_path (str): Input video.
+        captions (list | str): Cues from caption_layout.layout_captions, or the
+            path of an SRT file (laid out here for the video's width).
+        output_path (str): Where to write the captioned video.
+    """
+    video = VideoFileClip(video_path)
+    if isinstance(captions, str):
+        captions = layout_captions(read_srt(captions), frame_width=video.w)
+
+    compositor = CaptionCompositor(captions, video.size, load_caption_font(CAPTION_FONT_SIZE))
+
+    # fl keeps the source audio; frames are captioned as they stream to the encoder
+    final = video.fl(compositor)
+
     final.write_videofile(output_path, codec='libx264', fps=video.fps, audio_codec='aac')
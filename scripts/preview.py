@@ -0,0 +1,147 @@
+import math
+import os
+import subprocess
+import threading
+
+PREVIEW_HEIGHT = 360          # Low-res rendition for instant playback
+PREVIEW_CRF = 30
+PREVIEW_MAXRATE = "600k"
+POSTER_WIDTH = 640
+THUMB_WIDTH = 160             # Width of each sprite-sheet thumbnail
+SPRITE_COLUMNS = 10
+MAX_THUMBNAILS = 100
+
+
+def ffmpeg_exe():
+    """ffmpeg binary bundled with moviepy (imageio-ffmpeg), else the one on PATH"""
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return "ffmpeg"
+
+
+def _run_ffmpeg(args):
+    cmd = [ffmpeg_exe(), "-y", "-loglevel", "error", *args]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def _probe(video_path):
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    infos = ffmpeg_parse_infos(video_path)
+    return infos["duration"], tuple(infos["video_size"])
+
+
+def preview_names(unique_id):
+    """Output filenames belonging to one job's preview assets"""
+    return {
+        "preview": f"preview_{unique_id}.mp4",
+        "poster": f"poster_{unique_id}.jpg",
+        "sprite": f"sprite_{unique_id}.jpg",
+        "sprite_vtt": f"sprite_{unique_id}.vtt",
+    }
+
+
+def generate_poster(video_path, poster_path, duration):
+    """Grab a single frame ~10% into the video"""
+    _run_ffmpeg([
+        "-ss", f"{min(duration * 0.1, 3.0):.2f}", "-i", video_path,
+        "-frames:v", "1", "-vf", f"scale={POSTER_WIDTH}:-2", "-q:v", "4",
+        poster_path,
+    ])
+
+
+def generate_sprite(video_path, sprite_path, vtt_path, duration, frame_size):
+    """
+    Tile evenly spaced thumbnails into one JPEG and describe them in a WebVTT
+    thumbnails track (the `sprite.jpg#xywh=x,y,w,h` convention used by players
+    for scrub previews). Only keyframes are decoded, so this is fast.
+    """
+    interval = max(1.0, duration / MAX_THUMBNAILS)
+    count = max(1, min(MAX_THUMBNAILS, int(math.ceil(duration / interval))))
+    rows = int(math.ceil(count / SPRITE_COLUMNS))
+    width, height = frame_size
+    thumb_h = int(round(THUMB_WIDTH * height / width / 2)) * 2
+
+    _run_ffmpeg([
+        "-skip_frame", "nokey", "-i", video_path,
+        "-vf", f"fps=1/{interval:.3f},scale={THUMB_WIDTH}:{thumb_h},tile={SPRITE_COLUMNS}x{rows}",
+        "-frames:v", "1", "-q:v", "5", "-vsync", "vfr",
+        sprite_path,
+    ])
+
+    def ts(seconds):
+        h, rem = divmod(seconds, 3600)
+        m, s = divmod(rem, 60)
+        return f"{int(h):02d}:{int(m):02d}:{s:06.3f}"
+
+    sprite_name = os.path.basename(sprite_path)
+    lines = ["WEBVTT", ""]
+    for i in range(count):
+        start = i * interval
+        end = min(duration, start + interval)
+        x = (i % SPRITE_COLUMNS) * THUMB_WIDTH
+        y = (i // SPRITE_COLUMNS) * thumb_h
+        lines += [f"{ts(start)} --> {ts(end)}", f"{sprite_name}#xywh={x},{y},{THUMB_WIDTH},{thumb_h}", ""]
+    with open(vtt_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+
+def generate_preview_rendition(video_path, preview_path):
+    """
+    Low-bitrate fragmented MP4: the moov box comes first and media is split
+    into small fragments, so playback starts after the first fragment instead
+    of after the whole file. Written to a temp name and renamed when complete.
+    """
+    tmp_path = preview_path + ".part"
+    _run_ffmpeg([
+        "-i", video_path,
+        "-vf", f"scale=-2:{PREVIEW_HEIGHT}",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", str(PREVIEW_CRF),
+        "-maxrate", PREVIEW_MAXRATE, "-bufsize", "1200k", "-g", "48",
+        "-c:a", "aac", "-b:a", "64k",
+        "-movflags", "frag_keyframe+empty_moov+default_base_moof",
+        "-f", "mp4", tmp_path,
+    ])
+    os.replace(tmp_path, preview_path)
+
+
+def start_thumbnails(video_path, output_folder, unique_id):
+    """
+    Start poster + sprite generation from the source video on a background
+    thread (they don't need the captions, so they can run alongside the
+    overlay render). Returns the thread; join() it before showing the result.
+    """
+    names = preview_names(unique_id)
+
+    def work():
+        try:
+            duration, frame_size = _probe(video_path)
+            generate_poster(video_path, os.path.join(output_folder, names["poster"]), duration)
+            generate_sprite(video_path, os.path.join(output_folder, names["sprite"]),
+                            os.path.join(output_folder, names["sprite_vtt"]), duration, frame_size)
+            print(f"🖼️  Poster + sprite sheet ready ({names['poster']})")
+        except Exception as e:
+            print(f"⚠️ Thumbnail generation failed: {e}")
+
+    thread = threading.Thread(target=work, name=f"thumbs-{unique_id}", daemon=True)
+    thread.start()
+    return thread
+
+
+def build_preview_rendition(rendered_path, output_folder, unique_id):
+    """
+    Transcode the captioned video into its preview rendition. Runs before the
+    job reports success, so the first result-page view already streams it.
+
+    Returns:
+        str: The rendition's filename, or None if it couldn't be built.
+    """
+    name = preview_names(unique_id)["preview"]
+    try:
+        generate_preview_rendition(rendered_path, os.path.join(output_folder, name))
+    except Exception as e:
+        print(f"⚠️ Preview rendition failed: {e}")
+        return None
+    print(f"📼 Preview rendition ready ({name})")
+    return name
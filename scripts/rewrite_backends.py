@@ -0,0 +1,229 @@
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# Backend selection: "auto" (Gemini with offline fallback), "gemini" or "offline"
+REWRITE_BACKEND = os.getenv("REWRITE_BACKEND", "auto")
+# After Gemini runs out of keys, skip it for this long so jobs don't stall on retries
+GEMINI_COOLDOWN_SECONDS = 300
+# Styles that never need an LLM call
+OFFLINE_STYLES = {"none"}
+# Concurrent rewrite calls for multi-language jobs (spread across the key pool)
+REWRITE_CONCURRENCY = int(os.getenv("REWRITE_CONCURRENCY", "8"))
+
+# Only filler when set off by commas (or opening/closing the caption):
+# "it was, like, huge" / "I mean, it's fine", but not "do you know what I mean?"
+FILLER_PHRASES = [
+    "like", "you know", "i mean", "kind of like", "sort of like",
+]
+FILLER_WORDS = [
+    "um", "umm", "uh", "uhh", "uhm", "erm", "er", "ah", "hmm", "mm", "mhm",
+]
+# Titles whose period never ends a sentence
+ABBREVIATIONS = ["mr", "mrs", "ms", "dr", "st", "vs"]
+
+_filler_phrase_re = re.compile(
+    r"(^|,)\s*(?:" + "|".join(re.escape(p) for p in FILLER_PHRASES) + r")\s*(,|(?=[.!]|\s*$))",
+    re.IGNORECASE,
+)
+_filler_word_re = re.compile(
+    r",?\s*\b(?:" + "|".join(FILLER_WORDS) + r")\b[.,]?",
+    re.IGNORECASE,
+)
+_repeated_word_re = re.compile(r"\b(\w+)(\s+\1\b)+", re.IGNORECASE)
+_space_before_punct_re = re.compile(r"\s+([,.!?;:])")
+# A period right after a single letter is part of a dotted abbreviation (e.g. / p.m. / U.S.)
+_missing_space_after_punct_re = re.compile(r"([,!?;:]|(?<![^A-Za-z][A-Za-z])(?<!^[A-Za-z])\.)(?=[A-Za-z])")
+_duplicate_punct_re = re.compile(r"([,.!?;:])[,.;:]+")
+_sentence_start_re = re.compile(r"(^|[.!?]\s+)([a-z])")
+_abbreviation_end_re = re.compile(
+    r"(?:\b(?:[A-Za-z]\.){2,}|\b(?:" + "|".join(ABBREVIATIONS) + r")\.)$",
+    re.IGNORECASE,
+)
+_lone_i_re = re.compile(r"\bi\b(?=('m|'ve|'ll|'d|\s|[,!?]|\.(?![A-Za-z])|$))")
+
+
+class RewriteResponse:
+    def __init__(self, text, backend):
+        self.text = text
+        self.backend = backend
+
+
+class BackendUnavailable(RuntimeError):
+    """The backend can't serve any request for a while (quota gone, SDK missing)."""
+
+
+class TranslationUnavailable(RuntimeError):
+    """The backend can't produce captions in the requested language."""
+
+
+class RewriteBackend(ABC):
+    """Base class for the caption rewrite stage."""
+    name = "base"
+
+    @abstractmethod
+    def rewrite(self, text, style="casual", lang="en", translate_only=False):
+        """Return a RewriteResponse for one caption."""
+
+
+class GeminiBackend(RewriteBackend):
+    """Style rewriting and translation through the Gemini key pool."""
+    name = "gemini"
+
+    def rewrite(self, text, style="casual", lang="en", translate_only=False):
+        # Imported lazily so the offline backend works without google-generativeai
+        try:
+            try:
+                from scripts.rewrite_captions_gemini import rewrite_captions, KeyPoolExhausted
+            except ImportError:
+                from rewrite_captions_gemini import rewrite_captions, KeyPoolExhausted
+        except ImportError as e:
+            raise BackendUnavailable(f"google-generativeai not installed ({e})")
+        try:
+            response = rewrite_captions(text, style=style, lang=lang, translate_only=translate_only)
+        except KeyPoolExhausted as e:
+            raise BackendUnavailable(str(e))
+        return RewriteResponse(response.text, self.name)
+
+
+class OfflineBackend(RewriteBackend):
+    """
+    Deterministic, network-free cleanup: filler-word removal, stutter
+    collapsing, punctuation spacing and sentence casing.
+
+    It cannot translate: non-English targets raise TranslationUnavailable
+    rather than ship English text labelled as another language.
+    """
+    name = "offline"
+
+    def rewrite(self, text, style="casual", lang="en", translate_only=False):
+        if lang != "en":
+            raise TranslationUnavailable(f"the {self.name} rewriter can't translate to '{lang}'")
+        return RewriteResponse(clean_caption_text(text), self.name)
+
+
+class FallbackBackend(RewriteBackend):
+    """
+    Use the primary backend, falling back per caption when it fails.
+
+    Only a BackendUnavailable (e.g. every Gemini key exhausted) benches the
+    primary for the cooldown; other errors, like a request that failed all
+    its retries, fall back for that one caption and try the primary again next.
+    """
+    name = "auto"
+
+    def __init__(self, primary, fallback, cooldown=GEMINI_COOLDOWN_SECONDS):
+        self.primary = primary
+        self.fallback = fallback
+        self.cooldown = cooldown
+        self._primary_down_until = 0.0
+
+    def rewrite(self, text, style="casual", lang="en", translate_only=False):
+        if time.time() >= self._primary_down_until:
+            try:
+                return self.primary.rewrite(text, style=style, lang=lang, translate_only=translate_only)
+            except BackendUnavailable as e:
+                # Key pool exhausted, no keys configured or SDK missing
+                self._primary_down_until = time.time() + self.cooldown
+                print(f"⚠️  {self.primary.name} unavailable ({e}); "
+                      f"using {self.fallback.name} rewriter for {self.cooldown}s")
+            except RuntimeError as e:
+                print(f"⚠️  {self.primary.name} failed ({e}); using {self.fallback.name} for this caption")
+        return self.fallback.rewrite(text, style=style, lang=lang, translate_only=translate_only)
+
+
+def _capitalize_sentence_start(m):
+    # "e.g. this" / "5 p.m. today": the period closes an abbreviation, not a sentence
+    if m.group(1) and _abbreviation_end_re.search(m.string[:m.start(1) + 1]):
+        return m.group(0)
+    return m.group(1) + m.group(2).upper()
+
+
+def clean_caption_text(text):
+    """Apply the offline cleanup rules to a single caption."""
+    cleaned = f" {text.strip()} "
+    # Keep the leading comma only when the filler sat between two commas
+    cleaned = _filler_phrase_re.sub(lambda m: m.group(1) if m.group(2) else " ", cleaned)
+    cleaned = _filler_word_re.sub(" ", cleaned)
+    cleaned = _repeated_word_re.sub(r"\1", cleaned)
+    cleaned = re.sub(r"\s+", " ", cleaned).strip(" ,")
+
+    cleaned = _space_before_punct_re.sub(r"\1", cleaned)
+    cleaned = _duplicate_punct_re.sub(r"\1", cleaned)
+    cleaned = _missing_space_after_punct_re.sub(r"\1 ", cleaned)
+    cleaned = _lone_i_re.sub("I", cleaned)
+    cleaned = _sentence_start_re.sub(_capitalize_sentence_start, cleaned)
+
+    if not cleaned.strip(".!?"):
+        # Caption was nothing but filler; keep it rather than emit an empty cue
+        return text.strip()
+    if cleaned[-1] not in ".!?…\"'":
+        cleaned += "."
+    return cleaned
+
+
+_offline_backend = OfflineBackend()
+_gemini_backend = GeminiBackend()
+_auto_backend = FallbackBackend(_gemini_backend, _offline_backend)
+
+BACKENDS = {
+    "offline": _offline_backend,
+    "gemini": _gemini_backend,
+    "auto": _auto_backend,
+}
+
+
+def get_backend(style="casual", backend=None):
+    """Pick the rewrite backend for a job."""
+    if style in OFFLINE_STYLES:
+        return _offline_backend
+    name = backend or REWRITE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown rewrite backend: {name}")
+    return BACKENDS[name]
+
+
+def rewrite_caption(text, style="casual", lang="en", backend=None):
+    """Rewrite one caption through the selected backend."""
+    return get_backend(style, backend).rewrite(text, style=style, lang=lang)
+
+
+def rewrite_captions_multi(texts, style="casual", langs=("en",), backend=None, max_workers=REWRITE_CONCURRENCY):
+    """
+    Rewrite a list of captions into several languages with parallel calls.
+
+    When English is one of the targets its styled pass runs first and the
+    other languages are translated from it (translate-only prompts), so the
+    style work is done once and every language carries the same wording.
+
+    A language that couldn't be translated (the offline backend handled any
+    of its captions) is left out of the result instead of being returned as
+    English; callers decide whether that fails the job.
+
+    Returns:
+        dict: {lang: [rewritten text per caption]}, in langs order.
+    """
+    chosen = get_backend(style, backend)
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        sources, translate_only = texts, False
+        if "en" in langs:
+            results["en"] = list(pool.map(lambda t: chosen.rewrite(t, style, "en").text, texts))
+            sources, translate_only = results["en"], True
+
+        futures = {
+            lang: [pool.submit(chosen.rewrite, t, style, lang, translate_only) for t in sources]
+            for lang in langs if lang != "en"
+        }
+        for lang, lang_futures in futures.items():
+            try:
+                results[lang] = [f.result().text for f in lang_futures]
+            except TranslationUnavailable as e:
+                for f in lang_futures:
+                    f.cancel()
+                print(f"⚠️  No captions for '{lang}': {e}")
+
+    return {lang: results[lang] for lang in langs if lang in results}
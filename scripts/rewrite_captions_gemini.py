@@ -1,26 +1,78 @@
 import random
+import threading
 import time
-from collections import defaultdict
+from contextlib import contextmanager
 from datetime import datetime
 import json
 import os
-import google.generativeai as genai
+try:
+    import fcntl
+except ImportError:  # Windows: dev mode runs every job in one process, the thread lock is enough
+    fcntl = None
+# The generative service client underneath google-generativeai: its
+# client_options take the API key per client instead of process-wide
+from google.ai import generativelanguage as glm
+from google.api_core import exceptions as api_errors
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-FAILED_KEYS_FILE = "disabled_keys.json"
-USAGE_FILE = "usage_counts.json"
+FAILED_KEYS_FILE = os.getenv("GEMINI_DISABLED_KEYS_FILE", "disabled_keys.json")
+USAGE_FILE = os.getenv("GEMINI_USAGE_FILE", "usage_counts.json")
+# Sidecar lock shared by both state files (they are replaced, not rewritten, on update)
+STATE_LOCK_FILE = f"{USAGE_FILE}.lock"
 DAILY_LIMIT = 500
 PER_MINUTE_LIMIT = 10
-minute_usage_tracker = defaultdict(list)
+# Point the client at a Gemini-compatible server instead of Google (e.g. the
+# load-test stand-in, "http://127.0.0.1:8765"); uses the REST transport
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT")
+RETRY_WAIT_SECONDS = float(os.getenv("GEMINI_RETRY_WAIT_SECONDS", "5"))
+# Section of USAGE_FILE holding each key's request times over the last minute
+RECENT_KEY = "_recent"
+# Rewrites run on several threads, and jobs in several worker processes, at
+# once: guard the JSON state files (thread lock + flock) and the client cache
+_state_lock = threading.Lock()
+_clients_lock = threading.Lock()
+_clients = {}
 
 class GeminiResponse:
     def __init__(self, text):
         self.text = text
 
+class KeyPoolExhausted(RuntimeError):
+    """No usable key: none configured, or every key disabled / over its limits"""
+
 # --- Helper functions ---
+def get_client(api_key):
+    """One generative-service client per API key, shared across threads"""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            options = {"api_key": api_key}
+            if GEMINI_API_ENDPOINT:
+                options["api_endpoint"] = GEMINI_API_ENDPOINT
+            client = glm.GenerativeServiceClient(
+                transport="rest" if GEMINI_API_ENDPOINT else None,
+                client_options=options,
+            )
+            _clients[api_key] = client
+    return client
+
+@contextmanager
+def locked_state():
+    """Exclusive access to the key state files across threads and worker processes (not reentrant)"""
+    with _state_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(STATE_LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 def load_json_file(filepath):
     if os.path.exists(filepath):
         with open(filepath, "r") as f:
@@ -28,50 +80,91 @@ def load_json_file(filepath):
     return {}
 
 def save_json_file(filepath, data):
-    with open(filepath, "w") as f:
+    # Write-then-rename so lock-free readers never see half a file
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp_path, filepath)
 
 def load_disabled_keys():
-    data = load_json_file(FAILED_KEYS_FILE)
+    with locked_state():
+        data = load_json_file(FAILED_KEYS_FILE)
     today = datetime.now().strftime("%Y-%m-%d")
     return set(data.get(today, []))
 
 def save_disabled_key(api_key):
     today = datetime.now().strftime("%Y-%m-%d")
-    data = load_json_file(FAILED_KEYS_FILE)
-    if today not in data: data[today] = []
-    if api_key not in data[today]: data[today].append(api_key)
-    save_json_file(FAILED_KEYS_FILE, data)
-
-def increment_usage(api_key):
-    now = datetime.now()
-    today = now.strftime("%Y-%m-%d")
-    usage = load_json_file(USAGE_FILE)
-    if today not in usage: usage[today] = {}
-    if api_key not in usage[today]: usage[today][api_key] = 0
-    usage[today][api_key] += 1
-    save_json_file(USAGE_FILE, usage)
-    # per-minute tracker
-    minute = now.strftime("%Y-%m-%d %H:%M")
-    minute_usage_tracker[api_key] = [ts for ts in minute_usage_tracker[api_key] if ts.startswith(minute)]
-    minute_usage_tracker[api_key].append(now.strftime("%Y-%m-%d %H:%M:%S"))
-
-def has_exceeded_daily_limit(api_key, limit=DAILY_LIMIT):
+    with locked_state():
+        data = load_json_file(FAILED_KEYS_FILE)
+        if today not in data: data[today] = []
+        if api_key not in data[today]: data[today].append(api_key)
+        save_json_file(FAILED_KEYS_FILE, data)
+
+def reserve_key(api_keys, disabled_keys, daily_limit=DAILY_LIMIT, minute_limit=PER_MINUTE_LIMIT):
+    """
+    Pick a random key with daily and per-minute headroom and count the request
+    against it before it is sent, so parallel rewrites (threads and worker
+    processes) can't all pass the limit check and burst past it together.
+
+    Returns:
+        tuple: (key or None, number of usable keys, seconds until a per-minute
+            slot frees up - None when every key is disabled or out for the day)
+    """
+    now = time.time()
     today = datetime.now().strftime("%Y-%m-%d")
-    usage = load_json_file(USAGE_FILE)
-    return usage.get(today, {}).get(api_key, 0) >= limit
+    with locked_state():
+        usage = load_json_file(USAGE_FILE)
+        day = usage.setdefault(today, {})
+        recent = usage.setdefault(RECENT_KEY, {})
+        usable, next_free = [], None
+        for k in api_keys:
+            stamps = recent[k] = [t for t in recent.get(k, []) if now - t < 60]
+            if k in disabled_keys or day.get(k, 0) >= daily_limit:
+                continue
+            if len(stamps) >= minute_limit:
+                # A slot opens when enough of this minute's requests age out
+                free_in = 60 - (now - stamps[-minute_limit])
+                next_free = free_in if next_free is None else min(next_free, free_in)
+                continue
+            usable.append(k)
+        if not usable:
+            return None, 0, next_free
+        key = random.choice(usable)
+        day[key] = day.get(key, 0) + 1
+        recent[key].append(now)
+        save_json_file(USAGE_FILE, usage)
+    return key, len(usable), None
 
-def has_exceeded_minute_limit(api_key, limit=PER_MINUTE_LIMIT):
-    current_minute = datetime.now().strftime("%Y-%m-%d %H:%M")
-    recent_times = [ts for ts in minute_usage_tracker[api_key] if ts.startswith(current_minute)]
-    return len(recent_times) >= limit
+def hold_key_for_minute(api_key, minute_limit=PER_MINUTE_LIMIT):
+    """After a per-minute 429, treat the key's current minute as used up (not the whole day)"""
+    now = time.time()
+    with locked_state():
+        usage = load_json_file(USAGE_FILE)
+        recent = usage.setdefault(RECENT_KEY, {})
+        stamps = [t for t in recent.get(api_key, []) if now - t < 60]
+        recent[api_key] = stamps + [now] * max(0, minute_limit - len(stamps))
+        save_json_file(USAGE_FILE, usage)
+
+def disables_key(error):
+    """Errors that make a key useless for the rest of the day: daily quota gone, key invalid"""
+    message = str(error).lower()
+    if isinstance(error, api_errors.ResourceExhausted):
+        return "perday" in message.replace(" ", "")
+    if isinstance(error, (api_errors.PermissionDenied, api_errors.Unauthenticated)):
+        return True
+    return isinstance(error, api_errors.InvalidArgument) and "api key" in message
 
 # --- Main function ---
 
-def rewrite_captions(text, style="casual", lang="en", model_name=None, max_retries=10, wait_seconds=5):
+def rewrite_captions(text, style="casual", lang="en", model_name=None, max_retries=10,
+                     wait_seconds=RETRY_WAIT_SECONDS, translate_only=False):
     """
     Rewrite captions using multiple Gemini API keys with automatic fallback.
     Polishes text AND translates to target language if needed.
+
+    With translate_only=True the text is assumed to be already rewritten in
+    the requested style (e.g. the English pass of a multi-language job) and
+    is only translated.
     """
     
     # Language name mapping
@@ -93,7 +186,15 @@ def rewrite_captions(text, style="casual", lang="en", model_name=None, max_retri
     target_language = language_names.get(lang.lower(), "English")
     
     # Build the prompt dynamically with translation support
-    if lang.lower() == "en":
+    if translate_only and lang.lower() != "en":
+        # Already styled - translate only, keeping the tone
+        prompt = f"""Translate the following caption to {target_language}.
+Keep its tone, meaning and approximate length.
+Only output the translated text in {target_language}, nothing else.
+
+Text: '{text}'
+"""
+    elif lang.lower() == "en":
         # English output - just rewrite with style
         prompt = f"""Rewrite the following text in a {style} style. 
 Remove filler words (um, uh, like, you know), fix grammar, and make it clear and engaging.
@@ -128,7 +229,7 @@ Text: '{text}'
             api_keys.append(key)
     
     if not api_keys:
-        raise RuntimeError("No Gemini API keys found in .env file")
+        raise KeyPoolExhausted("No Gemini API keys found in .env file")
 
     model_names = [model_name or "gemini-2.5-flash-preview-05-20"]
     disabled_keys_today = load_disabled_keys()
@@ -137,36 +238,35 @@ Text: '{text}'
     print(f"🚫 Disabled keys today: {len(disabled_keys_today)}")
 
     for attempt in range(max_retries):
-        available_keys = [
-            k for k in api_keys
-            if k not in disabled_keys_today
-            and not has_exceeded_daily_limit(k)
-            and not has_exceeded_minute_limit(k)
-        ]
-        if not available_keys:
-            print(f"❌ All API keys disabled or exceeded limits.")
-            raise RuntimeError("All API keys disabled or exceeded limits.")
-
-        key = random.choice(available_keys)
+        key, available, free_in = reserve_key(api_keys, disabled_keys_today)
+        if key is None:
+            if free_in is None:
+                print(f"❌ All API keys disabled or exceeded limits.")
+                raise KeyPoolExhausted("All API keys disabled or exceeded limits.")
+            # Only the per-minute limits are in the way: wait for the first free slot
+            print(f"   ⏳ Every key is at its per-minute limit; waiting {free_in:.1f}s")
+            time.sleep(free_in)
+            continue
+
         model = random.choice(model_names)
 
         print(f"\n🔄 Attempt {attempt + 1}/{max_retries}")
         print(f"   🔑 Key: ...{key[-6:]}")
         print(f"   🤖 Model: {model}")
-        print(f"   ✅ Available keys: {len(available_keys)}/{len(api_keys)}")
+        print(f"   ✅ Available keys: {available}/{len(api_keys)}")
 
         try:
-            import time
             start_time = time.time()
             
-            genai.configure(api_key=key)
-            gemini = genai.GenerativeModel(model)
-            
-            response = gemini.generate_content(prompt)
-            increment_usage(key)
+            response = get_client(key).generate_content(glm.GenerateContentRequest(
+                model=f"models/{model}",
+                contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            ))
             
             api_time = time.time() - start_time
-            output_text = response.text.strip()
+            if not response.candidates:
+                raise RuntimeError(f"No candidates returned ({response.prompt_feedback})")
+            output_text = "".join(part.text for part in response.candidates[0].content.parts).strip()
             
             print(f"   ✅ SUCCESS in {api_time:.2f}s")
             print(f"   📤 Output: {output_text[:60]}{'...' if len(output_text) > 60 else ''}")
@@ -177,7 +277,14 @@ Text: '{text}'
         except Exception as e:
             error_msg = str(e)
             print(f"   ❌ FAILED: {error_msg[:80]}{'...' if len(error_msg) > 80 else ''}")
-            save_disabled_key(key)
+            if disables_key(e):
+                save_disabled_key(key)
+                disabled_keys_today.add(key)
+                print(f"   🚫 Key disabled for today")
+            elif isinstance(e, api_errors.ResourceExhausted):
+                # Per-minute rate limit: rest this key, the rotation uses the others
+                hold_key_for_minute(key)
+            # 5xx and network errors are transient: the key stays in the rotation
             if attempt < max_retries - 1:
                 print(f"   ⏳ Waiting {wait_seconds}s before retry...")
                 time.sleep(wait_seconds)
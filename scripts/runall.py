@@ -5,16 +5,25 @@ ssl._create_default_https_context = lambda: ssl_context
 
 import argparse
 import os
-from transcribe import transcribe_video
-from generate_srt import segments_to_srt
-from rewrite_captions_gemini import rewrite_captions  # Updated multi-key Gemini
-from overlay import overlay_captions
+import tempfile
+from transcribe import transcribe_video, extract_audio, AudioExtractionError
+from generate_srt import write_srt, CAPTION_WRITERS
+from caption_layout import layout_captions, probe_frame_size, TEXT_ONLY_MAX_CHARS
+from rewrite_backends import rewrite_captions_multi  # Gemini with offline fallback
+
+def _with_lang(path, lang):
+    """output.srt -> output_hi.srt"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{lang}{ext}"
 
 def main():
     parser = argparse.ArgumentParser(description="Automated Caption Generator")
     parser.add_argument("--video", required=True, help="Path to input video")
-    parser.add_argument("--style", default="casual", help="Caption style: casual/formal/aesthetic")
-    parser.add_argument("--lang", default="en", help="Language code for captions (e.g., en, hi)")
+    parser.add_argument("--style", default="casual", help="Caption style: casual/formal/aesthetic, or none for offline cleanup only")
+    parser.add_argument("--lang", default="en", help="Language code(s) for captions, comma separated (e.g., en or en,hi,es)")
+    parser.add_argument("--soft-subs", action="store_true", help="Mux every language as a subtitle track instead of burning captions in")
+    parser.add_argument("--captions-only", action="store_true", help="Only write caption files; skip video rendering (fastest)")
+    parser.add_argument("--formats", default="", help="Extra caption formats next to each SRT, comma separated (vtt,ass)")
     parser.add_argument("--srt_output", default="output.srt", help="Path to save generated SRT file")
     parser.add_argument("--video_output", default="output.mp4", help="Path to save final video with captions")
     args = parser.parse_args()
@@ -23,23 +32,69 @@ def main():
         print(f"❌ Video file not found: {args.video}")
         return
 
-    print("🔹 Transcribing video...")
-    segments = transcribe_video(args.video)
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in CAPTION_WRITERS]
+    if unknown:
+        print(f"❌ Unknown caption format(s): {', '.join(unknown)} (choose from {', '.join(CAPTION_WRITERS)})")
+        return
+
+    if args.captions_only:
+        # Whisper only needs the audio track; skip decoding the whole video container
+        print("🔹 Extracting audio...")
+        with tempfile.TemporaryDirectory() as tmp:
+            try:
+                audio_path = extract_audio(args.video, os.path.join(tmp, "audio.wav"))
+            except AudioExtractionError as e:
+                print(f"❌ {e}")
+                return
+            segments = transcribe_video(audio_path)
+    else:
+        print("🔹 Transcribing video...")
+        segments = transcribe_video(args.video)
     if not segments:
         print("❌ No transcription segments found.")
         return
 
-    print("🔹 Rewriting captions via Gemini API...")
-    for i, seg in enumerate(segments):
-        print(f"   ↪ Processing segment {i+1}/{len(segments)}...")
-        response = rewrite_captions(seg["text"], style=args.style, lang=args.lang)
-        seg["text"] = response.text
+    langs = [l.strip() for l in args.lang.split(",") if l.strip()]
+    print(f"🔹 Rewriting captions ({', '.join(langs)})...")
+    rewritten = rewrite_captions_multi([seg["text"] for seg in segments], style=args.style, langs=langs)
+    if langs[0] not in rewritten:
+        print(f"❌ Captions couldn't be translated to '{langs[0]}' (the offline rewriter only writes English).")
+        return
+    # Languages that couldn't be translated are skipped rather than written as English
+    langs = [l for l in langs if l in rewritten]
+
+    print("🔹 Laying out captions...")
+    # Captions-only output has no frame to fit, so lines break at the usual subtitle line length
+    frame_width = None if args.captions_only else probe_frame_size(args.video)[0]
+    srt_paths = {}
+    captions_by_lang = {}
+    for i, lang in enumerate(langs):
+        lang_segments = [dict(seg, text=text) for seg, text in zip(segments, rewritten[lang])]
+        captions_by_lang[lang] = layout_captions(lang_segments, frame_width=frame_width, max_chars=TEXT_ONLY_MAX_CHARS)
+        srt_paths[lang] = args.srt_output if i == 0 else _with_lang(args.srt_output, lang)
+        print(f"🔹 Generating SRT file → {srt_paths[lang]}")
+        write_srt(captions_by_lang[lang], srt_paths[lang])
+        for fmt in formats:
+            path = os.path.splitext(srt_paths[lang])[0] + "." + fmt
+            print(f"🔹 Generating {fmt.upper()} file → {path}")
+            CAPTION_WRITERS[fmt](captions_by_lang[lang], path)
 
-    print(f"🔹 Generating SRT file → {args.srt_output}")
-    segments_to_srt(segments, args.srt_output)
+    if args.captions_only:
+        print("✅ Done! Captions saved as:", ", ".join(srt_paths.values()))
+        return
 
-    print(f"🔹 Overlaying captions on video → {args.video_output}")
-    overlay_captions(args.video, args.srt_output, args.video_output)
+    # Imported here so captions-only runs never load moviepy
+    if args.soft_subs:
+        from subtitle_mux import mux_soft_subtitles
+        print(f"🔹 Muxing {len(langs)} subtitle track(s) → {args.video_output}")
+        mux_soft_subtitles(args.video, srt_paths, args.video_output)
+    else:
+        from overlay import overlay_captions
+        for i, lang in enumerate(langs):
+            video_output = args.video_output if i == 0 else _with_lang(args.video_output, lang)
+            print(f"🔹 Overlaying captions on video → {video_output}")
+            overlay_captions(args.video, captions_by_lang[lang], video_output)
 
     print("✅ Done! Output saved as:", args.video_output)
 
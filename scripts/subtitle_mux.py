@@ -0,0 +1,58 @@
+import subprocess
+
+try:
+    from scripts.preview import ffmpeg_exe
+except ImportError:
+    from preview import ffmpeg_exe
+
+# ISO 639-2 codes for the container's subtitle-track language tags
+ISO639_2 = {
+    "en": "eng", "es": "spa", "fr": "fra", "de": "deu", "it": "ita", "pt": "por",
+    "hi": "hin", "zh": "zho", "ja": "jpn", "ko": "kor", "ar": "ara", "ru": "rus",
+}
+
+
+class SubtitleMuxError(RuntimeError):
+    """ffmpeg couldn't write the soft-subtitle MP4; the message is fit to show users"""
+
+
+def mux_soft_subtitles(video_path, srt_paths, output_path):
+    """
+    Write one MP4 carrying every language as a selectable (soft) subtitle track.
+
+    Video and audio are stream-copied, so this takes seconds regardless of
+    length: no frame is decoded or re-encoded. Audio MP4 can't hold (PCM,
+    Vorbis, ...) is re-encoded to AAC instead.
+
+    Args:
+        video_path (str): Source video.
+        srt_paths (dict): {lang: srt_path}, in track order (first is default).
+        output_path (str): Output .mp4 path.
+
+    Raises:
+        SubtitleMuxError: ffmpeg failed even with AAC audio (with its error).
+    """
+    cmd = [ffmpeg_exe(), "-y", "-loglevel", "error", "-i", video_path]
+    for srt_path in srt_paths.values():
+        cmd += ["-i", srt_path]
+
+    cmd += ["-map", "0:v", "-map", "0:a?"]
+    for i in range(len(srt_paths)):
+        cmd += ["-map", f"{i + 1}:s"]
+
+    cmd += ["-c:v", "copy", "-c:s", "mov_text"]
+    for i, lang in enumerate(srt_paths):
+        cmd += [f"-metadata:s:s:{i}", f"language={ISO639_2.get(lang, 'und')}"]
+        cmd += [f"-disposition:s:{i}", "default" if i == 0 else "0"]
+
+    for audio in (["-c:a", "copy"], ["-c:a", "aac", "-b:a", "192k"]):
+        proc = subprocess.run(cmd + audio + ["-movflags", "+faststart", output_path],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        if proc.returncode == 0:
+            break
+        stderr = proc.stderr.decode(errors="replace").strip()
+        if audio[1] == "copy":
+            print(f"⚠️  Audio can't be copied into MP4, re-encoding to AAC: {stderr.splitlines()[-1] if stderr else 'ffmpeg failed'}")
+    else:
+        raise SubtitleMuxError(f"Couldn't add the subtitle tracks: {stderr.splitlines()[-1] if stderr else 'ffmpeg failed'}")
+    print(f"✅ Soft-subtitle MP4 saved: {output_path} ({len(srt_paths)} tracks)")
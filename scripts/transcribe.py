@@ -5,10 +5,156 @@ ssl._create_default_https_context = lambda: ssl_context
 
 from faster_whisper import WhisperModel
 import torch
+import json
 import os
+import subprocess
+from collections import OrderedDict
 
-# Cache the model to avoid reloading
-_cached_model = None
+try:
+    from scripts.preview import ffmpeg_exe
+except ImportError:
+    from preview import ffmpeg_exe
+
+# Per-model CPU settings written by scripts/autotune.py for this host
+WHISPER_TUNING_FILE = os.getenv("WHISPER_TUNING_FILE", "whisper_tuning.json")
+
+# Decoding options shared by transcribe_video and the autotuner
+TRANSCRIBE_OPTIONS = dict(
+    language="en",  # Skip language detection (saves time)
+    vad_filter=True,  # Voice activity detection (removes silence)
+    vad_parameters=dict(min_silence_duration_ms=500),
+    condition_on_previous_text=False,  # Faster processing
+    compression_ratio_threshold=2.4,
+    log_prob_threshold=-1.0,
+    no_speech_threshold=0.6,
+)
+
+# Loaded models kept per process, least recently used dropped first: every
+# worker process holds its own copies, so a few large sizes would exhaust RAM
+MAX_CACHED_MODELS = max(1, int(os.getenv("MAX_CACHED_MODELS", "2")))
+
+# Cache loaded models to avoid reloading
+_cached_models = OrderedDict()
+_tuning = None
+
+def load_tuning():
+    """
+    Autotuned settings per model size ({} if this host hasn't been tuned).
+
+    The tuning file keeps one entry per number of concurrently benchmarked
+    processes; the one matching INFERENCE_WORKERS (or the closest count
+    tuned) is used, since thread counts that suit one worker oversubscribe
+    the CPU when several share it.
+    """
+    global _tuning
+    if _tuning is None:
+        _tuning = {}
+        if os.path.exists(WHISPER_TUNING_FILE):
+            with open(WHISPER_TUNING_FILE, 'r') as f:
+                tuned = json.load(f)
+            workers = max(1, int(os.getenv("INFERENCE_WORKERS", "2")))
+            for model_size, by_processes in tuned.items():
+                if "compute_type" in by_processes:
+                    by_processes = {"1": by_processes}  # Older single-process format
+                processes = min(by_processes, key=lambda n: (abs(int(n) - workers), int(n)))
+                config = by_processes[processes]
+                # Thread counts tuned on a different machine don't transfer
+                if config.get("cpu_count") != os.cpu_count():
+                    print(f"⚠️  Ignoring {model_size} tuning from a {config.get('cpu_count')}-core host")
+                    continue
+                if int(processes) != workers:
+                    print(f"⚠️  Using {model_size} tuning for {processes} worker(s); "
+                          f"run autotune --processes {workers} for this setup")
+                _tuning[model_size] = config
+    return _tuning
+
+def whisper_settings(model_size, device):
+    """
+    Model and decoding settings: GPU defaults, autotuned values on a tuned
+    CPU host, otherwise the CPU defaults (int8, library thread counts, beam 5).
+    """
+    if device == "cuda":
+        return {"compute_type": "float16", "cpu_threads": 0, "num_workers": 1, "beam_size": 5}
+    settings = {"compute_type": "int8", "cpu_threads": 0, "num_workers": 1, "beam_size": 5}
+    tuned = load_tuning().get(model_size)
+    if tuned:
+        settings.update({k: tuned[k] for k in settings if k in tuned})
+    return settings
+
+def load_whisper_model(model_size="base"):
+    """
+    Load a faster-whisper model (or reuse the cached one).
+
+    Long-lived workers call this at startup so the first job doesn't pay
+    the load time.
+
+    Returns:
+        tuple: (model, device, compute_type)
+    """
+    # Use GPU if available (much faster!)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # FP16 on GPU; INT8 on CPU unless autotune found something better for this host
+    settings = whisper_settings(model_size, device)
+    compute_type = settings["compute_type"]
+
+    # Cache model to avoid reloading (saves 5-10 seconds)
+    cache_key = f"{model_size}_{device}_{compute_type}_{settings['cpu_threads']}_{settings['num_workers']}"
+    if cache_key not in _cached_models:
+        while len(_cached_models) >= MAX_CACHED_MODELS:
+            evicted, _ = _cached_models.popitem(last=False)
+            print(f"🗑️  Unloading cached {evicted.split('_')[0]} model")
+        print(f"🔄 Loading {model_size} model...")
+        import time
+        start_load = time.time()
+        
+        # Load faster-whisper model
+        model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=settings["cpu_threads"],  # 0 = library default
+            num_workers=settings["num_workers"],
+            download_root=None,  # Use default cache location
+            local_files_only=False
+        )
+        
+        _cached_models[cache_key] = model
+        load_time = time.time() - start_load
+        print(f"✅ Model loaded in {load_time:.1f}s")
+    else:
+        print(f"♻️  Using cached {model_size} model (saved ~5-10s)")
+        _cached_models.move_to_end(cache_key)
+        model = _cached_models[cache_key]
+
+    return model, device, compute_type
+
+class AudioExtractionError(RuntimeError):
+    """ffmpeg couldn't produce the audio file; the message is fit to show users"""
+
+
+def extract_audio(video_path, output_path):
+    """
+    Copy just the audio track to a 16 kHz mono WAV (what Whisper consumes).
+
+    The video stream is dropped without being decoded, so this takes a
+    moment even for long HD files.
+
+    Raises:
+        AudioExtractionError: No audio track, or ffmpeg failed (with its error).
+    """
+    proc = subprocess.run(
+        [ffmpeg_exe(), "-y", "-loglevel", "error", "-i", video_path,
+         "-vn", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", output_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode(errors="replace").strip()
+        # -vn leaves nothing to write when the input has no audio stream
+        if "does not contain any stream" in stderr or "matches no streams" in stderr:
+            raise AudioExtractionError("This video has no audio track")
+        raise AudioExtractionError(f"Couldn't extract the audio: {stderr.splitlines()[-1] if stderr else 'ffmpeg failed'}")
+    return output_path
 
 def transcribe_video(video_path, model_size="base"):
     """
@@ -24,17 +170,8 @@ def transcribe_video(video_path, model_size="base"):
     
     faster-whisper is 4-8x faster than OpenAI Whisper!
     """
-    global _cached_model
-    
-    # Use GPU if available (much faster!)
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    
-    # Compute type for faster-whisper
-    if device == "cuda":
-        compute_type = "float16"  # FP16 for GPU (2x faster)
-    else:
-        compute_type = "int8"  # INT8 for CPU (faster inference)
-    
+
     print("\n" + "="*60)
     print("🎤 WHISPER TRANSCRIPTION STARTED (faster-whisper)")
     print("="*60)
@@ -50,37 +187,19 @@ def transcribe_video(video_path, model_size="base"):
         print(f"🚀 Using faster-whisper (4-8x faster)")
     else:
         print(f"⚠️  Running on CPU (slower)")
-        print(f"⚡ Optimizations: INT8 quantization enabled")
-    
-    # Cache model to avoid reloading (saves 5-10 seconds)
-    cache_key = f"{model_size}_{device}_{compute_type}"
-    if _cached_model is None or _cached_model[0] != cache_key:
-        print(f"🔄 Loading {model_size} model...")
-        import time
-        start_load = time.time()
-        
-        # Load faster-whisper model
-        model = WhisperModel(
-            model_size,
-            device=device,
-            compute_type=compute_type,
-            download_root=None,  # Use default cache location
-            local_files_only=False
-        )
-        
-        _cached_model = (cache_key, model)
-        load_time = time.time() - start_load
-        print(f"✅ Model loaded in {load_time:.1f}s")
-    else:
-        print(f"♻️  Using cached {model_size} model (saved ~5-10s)")
-        model = _cached_model[1]
+
+    settings = whisper_settings(model_size, device)
+    if device == "cpu" and model_size in load_tuning():
+        print(f"🎛️  Autotuned: {settings['cpu_threads']} threads, {settings['num_workers']} worker(s)")
+
+    model, device, compute_type = load_whisper_model(model_size)
     
     # Log transcription parameters
     print(f"\n📋 Transcription Parameters:")
     print(f"   • Language: English (auto-detection disabled)")
     print(f"   • Precision: {compute_type.upper()}")
     print(f"   • VAD Filter: Enabled (removes silence)")
-    print(f"   • Beam size: 5 (balanced)")
+    print(f"   • Beam size: {settings['beam_size']}")
     
     # Optimized transcription settings
     import time
@@ -90,14 +209,8 @@ def transcribe_video(video_path, model_size="base"):
     # faster-whisper transcription
     segments_generator, info = model.transcribe(
         video_path,
-        language="en",  # Skip language detection (saves time)
-        beam_size=5,
-        vad_filter=True,  # Voice activity detection (removes silence)
-        vad_parameters=dict(min_silence_duration_ms=500),
-        condition_on_previous_text=False,  # Faster processing
-        compression_ratio_threshold=2.4,
-        log_prob_threshold=-1.0,
-        no_speech_threshold=0.6,
+        beam_size=settings["beam_size"],
+        **TRANSCRIBE_OPTIONS,
     )
     
     # Convert generator to list and format as expected
@@ -0,0 +1,83 @@
+"""
+Production entry point.
+
+Runs the Flask app under gunicorn (preforking, no debugger) and the
+inference worker pool side by side. The web processes only validate
+uploads, enqueue jobs and serve pages/files; all Whisper and overlay work
+happens in worker.py processes. This supervisor also runs the one
+storage sweeper for outputs/, so extra worker pools started by hand never
+evict files concurrently with it.
+
+    python serve.py --web-workers 4 --inference-workers 2 --bind 0.0.0.0:8000
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the caption generator in production mode")
+    parser.add_argument("--bind", default=os.getenv("BIND", "0.0.0.0:8000"), help="host:port for gunicorn")
+    parser.add_argument("--web-workers", type=int, default=int(os.getenv("WEB_WORKERS", "4")),
+                        help="Number of gunicorn web processes")
+    parser.add_argument("--inference-workers", type=int, default=int(os.getenv("INFERENCE_WORKERS", "2")),
+                        help="Number of inference worker processes")
+    parser.add_argument("--preload", nargs="*", default=["base"],
+                        help="Whisper model sizes each inference worker loads at startup")
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    # The sweeper below uses the same relative outputs/ and database paths as the children
+    os.chdir(root)
+
+    # Create/migrate both databases once, before any web or inference process starts
+    from database import init_db
+    from jobqueue import init_queue
+    init_db()
+    init_queue()
+
+    # Output housekeeping runs here, exactly once for every web and inference process
+    from storage import StorageManager
+    os.makedirs("outputs", exist_ok=True)
+    StorageManager("outputs").start_sweeper()
+
+    # Web processes size admission-control queue waits by the number of inference workers
+    env = dict(os.environ, CAPTION_JOB_QUEUE="1", INFERENCE_WORKERS=str(args.inference_workers))
+
+    pool = subprocess.Popen(
+        [sys.executable, "worker.py", "--workers", str(args.inference_workers), "--preload", *args.preload],
+        env=env,
+        cwd=root,
+    )
+    web = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app:app",
+         "--workers", str(args.web_workers),
+         "--bind", args.bind,
+         # Uploads up to 500MB can be slow to arrive; don't kill the worker mid-upload
+         "--timeout", "300",
+         "--access-logfile", "-"],
+        env=env,
+        cwd=root,
+    )
+
+    def shutdown(*_):
+        for proc in (web, pool):
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    # If either side dies, take the other down too so a supervisor can restart both
+    while web.poll() is None and pool.poll() is None:
+        time.sleep(1)
+    shutdown()
+    web.wait()
+    pool.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+import threading
+import time
+
+from database import (get_output_file_owners, mark_video_evicted, touch_video_file, get_live_video_files,
+                      get_video_access_times)
+from checkpoints import purge_stale_checkpoints
+
+MB = 1024 * 1024
+
+# Quotas for the outputs folder (override in .env)
+GLOBAL_QUOTA_MB = int(os.getenv("STORAGE_QUOTA_MB", "5120"))
+USER_QUOTA_MB = int(os.getenv("USER_STORAGE_QUOTA_MB", "1024"))
+SWEEP_INTERVAL_SECONDS = int(os.getenv("STORAGE_SWEEP_INTERVAL", "300"))
+# Never evict a video rendered this recently (the user is probably about to watch it)
+MIN_AGE_SECONDS = 600
+
+VIDEO_PREFIX = "captioned_"
+PREVIEW_PREFIX = "preview_"
+
+
+class StorageManager:
+    """
+    Keeps the outputs folder within its disk quotas.
+
+    Every file in the folder is counted against the global quota, and files
+    belonging to a logged-in user's history also count against that user's
+    quota. When a quota is exceeded the least-recently-downloaded rendered
+    videos are deleted; SRT files are small and always kept, so the history
+    entry stays useful and can be re-rendered from its captions.
+
+    Recency comes from videos.last_accessed_at (set on render and on every
+    download/preview), never from file atimes, which noatime/relatime mounts
+    and backup tools make meaningless. Guest videos have no row and are
+    ordered by render time.
+    """
+
+    def __init__(self, output_folder, global_quota_mb=GLOBAL_QUOTA_MB, user_quota_mb=USER_QUOTA_MB):
+        self.output_folder = output_folder
+        self.global_quota = global_quota_mb * MB
+        self.user_quota = user_quota_mb * MB
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    def _scan(self):
+        """Stat every output file: {filename: {'bytes', 'mtime'}}"""
+        files = {}
+        for entry in os.scandir(self.output_folder):
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            files[entry.name] = {
+                'bytes': st.st_size,
+                'mtime': st.st_mtime,
+            }
+        return files
+
+    def usage(self):
+        """Bytes used overall and per user id (guest files are under None)"""
+        files = self._scan()
+        owners = get_output_file_owners()
+        per_user = {}
+        for name, info in files.items():
+            owner = owners.get(name)
+            per_user[owner] = per_user.get(owner, 0) + info['bytes']
+        return {
+            'total_bytes': sum(info['bytes'] for info in files.values()),
+            'per_user_bytes': per_user,
+        }
+
+    def record_access(self, filename):
+        """Mark an output as just downloaded so it moves to the back of the LRU"""
+        if filename.startswith(VIDEO_PREFIX):
+            touch_video_file(filename)
+
+    def _evict(self, name, files):
+        path = os.path.join(self.output_folder, name)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        mark_video_evicted(name)
+        info = files.pop(name)
+
+        # The preview rendition goes with its video; poster and sprites are tiny and stay
+        preview = PREVIEW_PREFIX + name[len(VIDEO_PREFIX):]
+        if preview in files:
+            os.remove(os.path.join(self.output_folder, preview))
+            info = {'bytes': info['bytes'] + files.pop(preview)['bytes']}
+        print(f"🧹 Evicted {name} ({info['bytes'] / MB:.1f} MB)")
+        return info['bytes']
+
+    def sweep(self):
+        """Enforce the quotas once and reconcile the videos table with the disk"""
+        with self._lock:
+            files = self._scan()
+            owners = get_output_file_owners()
+            now = time.time()
+
+            # Rows whose video vanished (deleted by hand, or a crash mid-sweep)
+            for video_file in get_live_video_files():
+                if video_file not in files:
+                    mark_video_evicted(video_file)
+
+            # Oldest access first; only rendered videos old enough are candidates
+            accessed = get_video_access_times()
+            candidates = sorted(
+                (name for name, info in files.items()
+                 if name.startswith(VIDEO_PREFIX) and now - info['mtime'] >= MIN_AGE_SECONDS),
+                key=lambda name: accessed.get(name, files[name]['mtime']),
+            )
+
+            freed = 0
+
+            # Per-user quotas
+            per_user = {}
+            for name, info in files.items():
+                owner = owners.get(name)
+                if owner is not None:
+                    per_user[owner] = per_user.get(owner, 0) + info['bytes']
+            for name in list(candidates):
+                owner = owners.get(name)
+                if owner is not None and per_user[owner] > self.user_quota:
+                    size = self._evict(name, files)
+                    per_user[owner] -= size
+                    freed += size
+                    candidates.remove(name)
+
+            # Global quota
+            total = sum(info['bytes'] for info in files.values())
+            for name in candidates:
+                if total <= self.global_quota:
+                    break
+                size = self._evict(name, files)
+                total -= size
+                freed += size
+
+            if freed:
+                print(f"🧹 Storage sweep freed {freed / MB:.1f} MB "
+                      f"({total / MB:.1f} / {self.global_quota / MB:.0f} MB used)")
+            return freed
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL_SECONDS):
+        """Run sweep() periodically on a daemon thread"""
+        if self._sweeper is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.sweep()
+                    purge_stale_checkpoints()
+                except Exception as e:
+                    print(f"⚠️ Storage sweep failed: {e}")
+                time.sleep(interval)
+
+        self._sweeper = threading.Thread(target=loop, name="storage-sweeper", daemon=True)
+        self._sweeper.start()
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import admission
+
+
+@pytest.fixture(autouse=True)
+def factors_file(tmp_path, monkeypatch):
+    path = tmp_path / "realtime_factors.json"
+    monkeypatch.setattr(admission, "REALTIME_FACTORS_FILE", str(path))
+    return path
+
+
+@pytest.fixture
+def duration(monkeypatch):
+    """A 100-second video: small = 90s, base = 70s, tiny = 65s with the default factors"""
+    monkeypatch.setattr(admission, "probe_duration", lambda path: 100.0)
+
+
+def test_runs_requested_model_when_it_fits(duration):
+    result = admission.admit("video.mp4", "small", slo_seconds=600)
+
+    assert result["decision"] == "run"
+    assert result["model"] == "small"
+    assert result["estimated_seconds"] == pytest.approx(90)
+
+
+def test_downgrades_to_largest_model_within_slo(duration):
+    result = admission.admit("video.mp4", "small", slo_seconds=80)
+
+    assert result["decision"] == "downgrade"
+    assert result["model"] == "base"
+    assert result["requested_model"] == "small"
+
+
+def test_backlog_is_spread_over_workers(duration):
+    # 200s of queued work over 2 workers is a 100s wait: only tiny still fits in 168s
+    result = admission.admit("video.mp4", "small", queued_seconds=200, workers=2, slo_seconds=168)
+
+    assert result["wait_seconds"] == pytest.approx(100)
+    assert result["decision"] == "downgrade"
+    assert result["model"] == "tiny"
+
+
+def test_queues_without_downgrading_when_backlog_breaks_slo(duration):
+    result = admission.admit("video.mp4", "small", queued_seconds=1000, workers=2, slo_seconds=100)
+
+    # Nothing fits after a 500s wait; small's own 90s does, so it isn't downgraded for nothing
+    assert result["decision"] == "queue"
+    assert result["model"] == "small"
+
+
+def test_more_renders_push_towards_smaller_models(duration):
+    assert admission.admit("video.mp4", "small", slo_seconds=150)["model"] == "small"
+    # Three burned-in languages: small = 210s, base = 190s, tiny = 185s
+    result = admission.admit("video.mp4", "small", slo_seconds=150, languages=3)
+    assert result["decision"] == "queue"
+    assert result["model"] == "tiny"
+
+
+def test_unknown_duration_runs_as_requested(monkeypatch):
+    monkeypatch.setattr(admission, "probe_duration", lambda path: None)
+
+    result = admission.admit("video.mp4", "large-v3", queued_seconds=10_000, slo_seconds=1)
+
+    assert result["decision"] == "run"
+    assert result["model"] == "large-v3"
+    assert result["estimated_seconds"] is None
+
+
+def test_record_run_updates_factors_as_ewma(factors_file):
+    admission.record_run("base", 100, transcribe_seconds=20, post_seconds=50)
+    data = json.loads(factors_file.read_text())
+    assert data["base"] == {"factor": pytest.approx(0.2), "runs": 1}
+    assert data["post"] == {"factor": pytest.approx(0.5), "runs": 1}
+
+    # Captions-only run: no render time, so "post" is untouched
+    admission.record_run("base", 100, transcribe_seconds=10)
+    data = json.loads(factors_file.read_text())
+    expected = (1 - admission.EWMA_ALPHA) * 0.2 + admission.EWMA_ALPHA * 0.1
+    assert data["base"] == {"factor": pytest.approx(expected), "runs": 2}
+    assert data["post"]["runs"] == 1
+
+    factors = admission.load_factors()
+    assert factors["base"] == pytest.approx(expected)
+    assert factors["small"] == admission.DEFAULT_FACTORS["small"]
+
+
+def test_record_run_ignores_unknown_duration(factors_file):
+    admission.record_run("base", None, transcribe_seconds=20)
+    admission.record_run("base", 0, transcribe_seconds=20)
+
+    assert not factors_file.exists()
@@ -0,0 +1,139 @@
+import os
+import sys
+import time
+import types
+
+import pytest
+
+import pipeline
+from checkpoints import JobCheckpoint, open_checkpoint, purge_stale_checkpoints
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "upload.mp4"
+    path.write_bytes(b"not really a video")
+    return str(path)
+
+
+def test_stages_complete_in_order(tmp_path, upload):
+    checkpoint = JobCheckpoint("job1", str(tmp_path)).create(upload, {"lang": "en"})
+
+    assert not os.path.exists(upload)  # Moved into the job directory
+    assert os.path.exists(checkpoint.source_path)
+    assert checkpoint.next_stage() == "transcribe"
+
+    checkpoint.complete("transcribe", 1.5, "segments.json", [{"start": 0, "end": 1, "text": "hi"}])
+    checkpoint.complete("rewrite", 0.5, "rewritten.json", {"en": ["Hi."]})
+    assert checkpoint.is_done("transcribe")
+    assert checkpoint.next_stage() == "srt"
+
+    checkpoint.complete("srt", 0.1)
+    checkpoint.complete("render", 2.0)
+    assert checkpoint.next_stage() is None
+
+
+def test_open_checkpoint_reloads_saved_state(tmp_path, upload):
+    checkpoint = JobCheckpoint("job1", str(tmp_path)).create(upload, {"lang": "fr"})
+    checkpoint.complete("transcribe", 1.0, "segments.json", [{"text": "bonjour"}])
+    checkpoint.fail("render crashed")
+
+    reloaded = open_checkpoint("job1", str(tmp_path))
+    assert reloaded.params == {"lang": "fr"}
+    assert reloaded.next_stage() == "rewrite"
+    assert reloaded.read("segments.json") == [{"text": "bonjour"}]
+    assert reloaded.record["error"] == "render crashed"
+    assert reloaded.source_path == checkpoint.source_path
+
+    assert open_checkpoint("missing", str(tmp_path)) is None
+
+
+def test_purge_removes_only_stale_jobs(tmp_path, upload):
+    stale = JobCheckpoint("stale", str(tmp_path)).create(upload, {})
+    fresh_upload = tmp_path / "fresh.mp4"
+    fresh_upload.write_bytes(b"")
+    fresh = JobCheckpoint("fresh", str(tmp_path)).create(str(fresh_upload), {})
+
+    old = time.time() - 48 * 3600
+    os.utime(os.path.join(stale.path, "job.json"), (old, old))
+
+    assert purge_stale_checkpoints(24, str(tmp_path)) == 1
+    assert not os.path.exists(stale.path)
+    assert fresh.exists
+
+
+def test_purge_without_jobs_folder(tmp_path):
+    assert purge_stale_checkpoints(24, str(tmp_path / "nothing-here")) == 0
+
+
+@pytest.fixture
+def stub_stages(tmp_path, monkeypatch):
+    """Replace the heavy stage modules with recording stubs and run jobs under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("outputs")
+    calls = {"transcribe": 0, "rewrite": 0, "layout": 0}
+    fail_layout = {"once": True}
+
+    def transcribe_video(path, model_size="base"):
+        calls["transcribe"] += 1
+        return [{"start": 0.0, "end": 1.0, "text": "hello there"}]
+
+    def rewrite_captions_multi(texts, style, langs):
+        calls["rewrite"] += 1
+        return {lang: [t.capitalize() + "." for t in texts] for lang in langs}
+
+    def layout_captions(segments, frame_width=None, max_chars=None):
+        calls["layout"] += 1
+        if fail_layout["once"]:
+            fail_layout["once"] = False
+            raise RuntimeError("layout blew up")
+        return [dict(seg) for seg in segments]
+
+    def write_srt(captions, path):
+        with open(path, "w") as f:
+            f.write("\n".join(c["text"] for c in captions))
+
+    transcribe = types.ModuleType("scripts.transcribe")
+    transcribe.transcribe_video = transcribe_video
+    transcribe.extract_audio = lambda video_path, output_path: output_path
+    transcribe.AudioExtractionError = RuntimeError
+    generate_srt = types.ModuleType("scripts.generate_srt")
+    generate_srt.write_srt = write_srt
+    generate_srt.CAPTION_WRITERS = {}
+    caption_layout = types.ModuleType("scripts.caption_layout")
+    caption_layout.layout_captions = layout_captions
+    caption_layout.probe_frame_size = lambda path: (1280, 720)
+    caption_layout.TEXT_ONLY_MAX_CHARS = 42
+    for name, module in (("scripts.transcribe", transcribe), ("scripts.generate_srt", generate_srt),
+                         ("scripts.caption_layout", caption_layout)):
+        monkeypatch.setitem(sys.modules, name, module)
+
+    import scripts.rewrite_backends
+    monkeypatch.setattr(scripts.rewrite_backends, "rewrite_captions_multi", rewrite_captions_multi)
+    monkeypatch.setattr(pipeline, "record_run", lambda *args, **kwargs: None)
+    monkeypatch.setattr(pipeline, "probe_duration", lambda path: 1.0)
+    return calls
+
+
+def test_resume_skips_finished_stages(stub_stages, upload):
+    with pytest.raises(RuntimeError, match="layout blew up"):
+        pipeline.process_video(upload, "job1", "clip.mp4", "none", "en",
+                               previews=False, subtitle_mode="captions")
+    assert stub_stages == {"transcribe": 1, "rewrite": 1, "layout": 1}
+    checkpoint = open_checkpoint("job1")
+    assert checkpoint.next_stage() == "srt"
+    assert checkpoint.record["error"] == "layout blew up"
+
+    result = pipeline.resume_job("job1")
+
+    # Whisper and the rewrite backend aren't paid for twice
+    assert stub_stages == {"transcribe": 1, "rewrite": 1, "layout": 2}
+    with open(os.path.join("outputs", result["srt_file"])) as f:
+        assert f.read() == "Hello there."
+    assert open_checkpoint("job1") is None  # Removed once the job succeeded
+
+
+def test_resume_of_unknown_job_fails_cleanly(stub_stages):
+    with pytest.raises(pipeline.PipelineError):
+        pipeline.resume_job("never-existed")
+
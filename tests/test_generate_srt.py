@@ -0,0 +1,21 @@
+import pytest
+
+pytest.importorskip("pysrt")
+pytest.importorskip("PIL")
+
+from scripts.generate_srt import write_vtt
+
+
+def test_vtt_escapes_cue_text(tmp_path):
+    captions = [
+        {'index': 1, 'start': 0.0, 'end': 1.5, 'text': "Q&A <3", 'lines': ["Q&A <3"]},
+        {'index': 2, 'start': 1.5, 'end': 3.0, 'text': "a --> b", 'lines': ["a --> b", "x > y"]},
+    ]
+    path = tmp_path / "captions.vtt"
+    write_vtt(captions, str(path))
+
+    assert path.read_text(encoding='utf-8') == (
+        "WEBVTT\n\n"
+        "1\n00:00:00.000 --> 00:00:01.500\nQ&amp;A &lt;3\n\n"
+        "2\n00:00:01.500 --> 00:00:03.000\na --&gt; b\nx &gt; y\n\n"
+    )
@@ -0,0 +1,91 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import jobqueue
+
+
+@pytest.fixture(autouse=True)
+def queue_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobqueue, "QUEUE_DATABASE", str(tmp_path / "job_queue.db"))
+    jobqueue.init_queue()
+
+
+def test_each_job_is_claimed_by_exactly_one_worker():
+    job_ids = {jobqueue.enqueue_job({"n": n}) for n in range(20)}
+
+    def drain(worker):
+        claimed = []
+        while (job := jobqueue.claim_next_job(worker)) is not None:
+            claimed.append(job["id"])
+        return claimed
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        claims = list(pool.map(drain, [f"worker-{i}" for i in range(4)]))
+
+    claimed = [job_id for worker_claims in claims for job_id in worker_claims]
+    assert sorted(claimed) == sorted(job_ids)
+    assert jobqueue.claim_next_job("late-worker") is None
+
+
+def test_claim_starts_a_lease_and_counts_the_attempt():
+    job_id = jobqueue.enqueue_job({})
+    job = jobqueue.claim_next_job("worker-0")
+
+    stored = jobqueue.get_job(job_id)
+    assert job["id"] == job_id
+    assert stored["status"] == "running"
+    assert stored["worker"] == "worker-0"
+    assert stored["attempts"] == 1
+    assert stored["heartbeat_at"] == pytest.approx(time.time(), abs=5)
+
+
+def test_only_jobs_with_a_lapsed_lease_are_requeued():
+    stale_id = jobqueue.enqueue_job({})
+    live_id = jobqueue.enqueue_job({})
+    jobqueue.claim_next_job("gone-pool-worker-0")
+    jobqueue.claim_next_job("live-pool-worker-0")
+
+    time.sleep(0.2)
+    jobqueue.renew_leases(["live-pool-worker-0"])
+
+    assert jobqueue.requeue_orphaned_jobs(lease_seconds=0.1) == (1, 0)
+    stale = jobqueue.get_job(stale_id)
+    assert stale["status"] == "queued"
+    assert stale["worker"] is None
+    assert stale["heartbeat_at"] is None
+    assert jobqueue.get_job(live_id)["status"] == "running"
+
+
+def test_fresh_leases_are_left_alone():
+    job_id = jobqueue.enqueue_job({})
+    jobqueue.claim_next_job("worker-0")
+
+    assert jobqueue.requeue_orphaned_jobs(lease_seconds=60) == (0, 0)
+    assert jobqueue.get_job(job_id)["status"] == "running"
+
+
+def test_released_job_is_claimed_again():
+    job_id = jobqueue.enqueue_job({})
+    jobqueue.claim_next_job("worker-0")
+
+    assert jobqueue.release_worker_jobs("worker-0") == (1, 0)
+    job = jobqueue.claim_next_job("worker-1")
+    assert job["id"] == job_id
+    assert jobqueue.get_job(job_id)["attempts"] == 2
+
+
+def test_job_fails_after_too_many_attempts(monkeypatch):
+    monkeypatch.setattr(jobqueue, "MAX_JOB_ATTEMPTS", 2)
+    job_id = jobqueue.enqueue_job({})
+
+    jobqueue.claim_next_job("worker-0")
+    assert jobqueue.release_worker_jobs("worker-0") == (1, 0)
+    jobqueue.claim_next_job("worker-1")
+    assert jobqueue.release_worker_jobs("worker-1") == (0, 1)
+
+    job = jobqueue.get_job(job_id)
+    assert job["status"] == "failed"
+    assert "crashed repeatedly" in job["error"]
+    assert jobqueue.claim_next_job("worker-2") is None
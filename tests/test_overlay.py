@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("PIL")
+pytest.importorskip("pysrt")
+pytest.importorskip("moviepy")
+
+from scripts.caption_layout import load_caption_font
+from scripts.overlay import CaptionCompositor
+
+CUES = [
+    {'start': 2.0, 'end': 3.0, 'lines': ["second"]},
+    {'start': 0.5, 'end': 1.5, 'lines': ["first"]},
+    {'start': 4.0, 'end': 4.0, 'lines': ["zero length"]},
+]
+
+
+@pytest.fixture
+def compositor():
+    return CaptionCompositor(CUES, (320, 240), load_caption_font(16))
+
+
+@pytest.mark.parametrize("t, expected", [
+    (0.0, None),
+    (0.5, 0),
+    (1.49, 0),
+    (1.5, None),  # End times are exclusive
+    (2.5, 1),
+    (4.0, None),  # Zero-length cues are dropped
+    (10.0, None),
+])
+def test_active_cue(compositor, t, expected):
+    assert compositor.active_cue(t) == expected
+
+
+def test_blends_into_a_copy_of_the_frame(compositor):
+    source = np.full((240, 320, 3), 255, dtype=np.uint8)
+    source.flags.writeable = False  # Some readers hand out read-only buffers
+
+    first = compositor(lambda t: source, 1.0)
+    # The reader may hand back the same cached array for a repeated frame
+    second = compositor(lambda t: source, 1.0)
+
+    x, y, _, _ = compositor.bitmap(0)
+    # Top-left of the caption box is background only: black at alpha 153 over white
+    assert first[y, x].tolist() == [102, 102, 102]
+    assert np.array_equal(first, second)
+    assert (source == 255).all()
+    assert first is not source
+
+
+def test_frames_without_a_cue_pass_through(compositor):
+    source = np.zeros((240, 320, 3), dtype=np.uint8)
+
+    assert compositor(lambda t: source, 0.0) is source
@@ -0,0 +1,86 @@
+import pytest
+
+from scripts.rewrite_backends import (
+    BackendUnavailable,
+    FallbackBackend,
+    OfflineBackend,
+    RewriteBackend,
+    RewriteResponse,
+    TranslationUnavailable,
+    clean_caption_text,
+    rewrite_captions_multi,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("um so, like, it was huge", "So, it was huge."),
+    ("I mean, it's fine", "It's fine."),
+    ("it was great, you know. then we left", "It was great. Then we left."),
+    # Not set off by commas: part of the sentence, not filler
+    ("do you know what I mean?", "Do you know what I mean?"),
+    ("I mean it", "I mean it."),
+    ("it's kind of like a dog", "It's kind of like a dog."),
+])
+def test_filler_phrases_only_removed_between_commas(text, expected):
+    assert clean_caption_text(text) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("e.g. this", "E.g. this."),
+    ("meet at 5 p.m. today", "Meet at 5 p.m. today."),
+    ("i think i.e. yes", "I think i.e. yes."),
+    ("the U.S. team won.they did", "The U.S. team won. They did."),
+    ("talk to mr. smith", "Talk to mr. smith."),
+])
+def test_dotted_abbreviations_are_left_alone(text, expected):
+    assert clean_caption_text(text) == expected
+
+
+def test_filler_only_caption_is_kept():
+    assert clean_caption_text("uh uh") == "uh uh"
+
+
+def test_offline_backend_refuses_to_translate():
+    with pytest.raises(TranslationUnavailable):
+        OfflineBackend().rewrite("hello there", lang="hi")
+
+
+def test_untranslated_languages_are_left_out():
+    result = rewrite_captions_multi(["hello there"], style="none", langs=["en", "hi"])
+    assert result == {"en": ["Hello there."]}
+
+
+class FlakyBackend(RewriteBackend):
+    name = "flaky"
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def rewrite(self, text, style="casual", lang="en", translate_only=False):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return RewriteResponse(text.upper(), self.name)
+
+
+def test_transient_failure_falls_back_for_one_caption_only():
+    primary = FlakyBackend(RuntimeError("All Gemini API attempts failed after retries."))
+    backend = FallbackBackend(primary, OfflineBackend())
+    assert backend.rewrite("hi there").backend == "offline"
+    primary.error = None
+    assert backend.rewrite("hi there").text == "HI THERE"
+
+
+def test_exhausted_primary_is_benched_for_the_cooldown():
+    primary = FlakyBackend(BackendUnavailable("All API keys disabled or exceeded limits."))
+    backend = FallbackBackend(primary, OfflineBackend(), cooldown=300)
+    backend.rewrite("hi there")
+    primary.error = None
+    assert backend.rewrite("hi there").backend == "offline"
+    assert primary.calls == 1
+
+
+def test_base_backend_is_abstract():
+    with pytest.raises(TypeError):
+        RewriteBackend()
@@ -0,0 +1,155 @@
+"""
+Inference worker pool for production mode.
+
+Each worker is a long-lived process that keeps its Whisper models loaded and
+pulls jobs from the local SQLite queue (jobqueue.py), so heavy transcription
+and overlay work never runs inside the web processes. Add capacity by
+starting more workers:
+
+    python worker.py --workers 4 --preload base
+
+Several pools can share one queue. Each pool renews a lease on the jobs its
+live workers hold; only jobs whose lease has lapsed (their pool is gone)
+are re-queued by another pool.
+"""
+import os
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'  # Fix OpenMP conflict
+
+import argparse
+import multiprocessing
+import signal
+import socket
+import time
+
+from jobqueue import (init_queue, claim_next_job, complete_job, fail_job, renew_leases,
+                      requeue_orphaned_jobs, release_worker_jobs)
+
+POLL_INTERVAL_SECONDS = 0.5
+SUPERVISE_INTERVAL_SECONDS = 2
+
+
+def worker_loop(worker_name, preload_models=()):
+    """Claim and run jobs forever"""
+    # Heavy imports happen here, once per worker process
+    from pipeline import process_video, rerender_video, resume_job, PipelineError
+    from scripts.transcribe import load_whisper_model, MAX_CACHED_MODELS
+
+    if len(preload_models) > MAX_CACHED_MODELS:
+        print(f"⚠️  Preloading only {preload_models[:MAX_CACHED_MODELS]} (MAX_CACHED_MODELS={MAX_CACHED_MODELS})")
+    for model_size in preload_models[:MAX_CACHED_MODELS]:
+        load_whisper_model(model_size)
+    print(f"👷 {worker_name} ready")
+
+    while True:
+        job = claim_next_job(worker_name)
+        if job is None:
+            time.sleep(POLL_INTERVAL_SECONDS)
+            continue
+
+        params = job['params']
+        print(f"👷 {worker_name} picked up job {job['id']} ({params['original_name']})")
+        try:
+            if params.get('kind') == 'rerender':
+                result = rerender_video(params['video_path'], params['video_file'],
+                                        params['srt_file'], params['output_folder'],
+                                        soft_tracks=params.get('soft_tracks'))
+                complete_job(job['id'], result)
+                continue
+            if params.get('kind') == 'resume':
+                complete_job(job['id'], resume_job(params['unique_id']))
+                continue
+            # A job re-queued after a worker restart picks up from its checkpoint
+            result = process_video(
+                params['video_path'],
+                params['unique_id'],
+                params['original_name'],
+                params['style'],
+                params['lang'],
+                speed=params['speed'],
+                user_id=job['user_id'],
+                username=params.get('username', 'Guest'),
+                output_folder=params['output_folder'],
+                previews=params.get('previews', True),
+                extra_langs=params.get('extra_langs', ()),
+                subtitle_mode=params.get('subtitle_mode', 'burn'),
+                requested_speed=params.get('requested_speed'),
+                caption_formats=params.get('caption_formats', ()),
+            )
+            complete_job(job['id'], result)
+        except PipelineError as e:
+            fail_job(job['id'], f"❌ {e}")
+        except Exception as e:
+            fail_job(job['id'], f"⚠️ An error occurred: {str(e)}")
+        finally:
+            # Normally already moved into the job's checkpoint directory
+            if params.get('video_path') and os.path.exists(params['video_path']):
+                os.remove(params['video_path'])
+
+
+def _interrupt(*_):
+    raise KeyboardInterrupt
+
+
+def _report_recovered(recovered, what):
+    requeued, failed = recovered
+    if requeued:
+        print(f"♻️  Re-queued {requeued} job(s) {what}")
+    if failed:
+        print(f"❌ Failed {failed} job(s) {what} after repeated crashes")
+
+
+def run_pool(num_workers, preload_models=()):
+    """Start the workers, keep their job leases fresh and restart any that die"""
+    init_queue()
+    _report_recovered(requeue_orphaned_jobs(), "left running by a pool that is gone")
+
+    # Workers pick the autotuned settings benchmarked for this many processes
+    os.environ['INFERENCE_WORKERS'] = str(num_workers)
+    # spawn (not fork) so every worker initialises torch/CTranslate2 cleanly
+    ctx = multiprocessing.get_context('spawn')
+    # The pid keeps worker names unique when several pools run on one host
+    prefix = f"{socket.gethostname()}-{os.getpid()}"
+    workers = {}
+
+    def start(i):
+        name = f"{prefix}-worker-{i}"
+        proc = ctx.Process(target=worker_loop, args=(name, tuple(preload_models)), name=name, daemon=True)
+        proc.start()
+        workers[i] = proc
+
+    for i in range(num_workers):
+        start(i)
+    signal.signal(signal.SIGTERM, _interrupt)  # Stop cleanly when serve.py shuts down
+    print(f"🚀 Inference pool running with {num_workers} worker(s)")
+
+    try:
+        while True:
+            time.sleep(SUPERVISE_INTERVAL_SECONDS)
+            for i, proc in list(workers.items()):
+                if not proc.is_alive():
+                    print(f"⚠️ {proc.name} exited (code {proc.exitcode}), restarting")
+                    # Its job would otherwise stay 'running' with a lease this pool keeps renewing
+                    _report_recovered(release_worker_jobs(proc.name), f"held by {proc.name}")
+                    start(i)
+            renew_leases([proc.name for proc in workers.values()])
+            # Picks up jobs from other pools that died since startup
+            _report_recovered(requeue_orphaned_jobs(), "left running by a pool that is gone")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in workers.values():
+            proc.terminate()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Caption inference worker pool")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INFERENCE_WORKERS", "2")),
+                        help="Number of inference worker processes")
+    parser.add_argument("--preload", nargs="*", default=["base"],
+                        help="Whisper model sizes to load at startup (e.g. tiny base; at most MAX_CACHED_MODELS)")
+    args = parser.parse_args()
+    run_pool(args.workers, args.preload)
+
+
+if __name__ == "__main__":
+    main()